@@ -0,0 +1,123 @@
+"""
+Async counterparts of ncaa.get_scoreboard and odds.fetch_ncaab_moneylines_cached.
+
+Same cache keys, TTL and stale-fallback semantics (in-process cache -> cache
+table -> upstream), but upstream calls go through the shared clients' async
+pools (upstream.py) and the cache table is read/written on an async session,
+so request handlers never block a thread.
+"""
+from __future__ import annotations
+
+import time
+from datetime import date
+
+import httpx
+
+from . import ncaa, odds
+from .db import get_async_sessionmaker
+from .local_cache import LOCAL_CACHE
+from .metrics import inc, span
+from .models import Cache
+from .ncaa import _proxy_url
+from .repo import cache_set, cache_value, clear_daily_picks
+from .upstream import UpstreamError, aclose_all
+
+
+async def close_http_client():
+    await aclose_all()
+
+
+async def _cache_read(key: str, ttl_seconds: int, now: int) -> tuple[tuple | None, Cache | None]:
+    """
+    ((value, created_at) if fresh else None, the row for a stale fallback).
+    """
+    kind = key.split(":", 1)[0]
+    async with get_async_sessionmaker()() as db:
+        with span("repo.cache_get"):
+            row = await db.get(Cache, key)
+        if row and (now - int(row.created_at) <= ttl_seconds):
+            try:
+                value = cache_value(row)
+                inc("cache_lookups_total", kind=kind, result="hit")
+                return (value, int(row.created_at)), row
+            except Exception:
+                # corrupted cache entry; caller refetches
+                inc("cache_lookups_total", kind=kind, result="corrupt")
+                return None, None
+        inc("cache_lookups_total", kind=kind, result="stale" if row else "miss")
+    return None, row
+
+
+async def _cache_write(key: str, value, now: int, ttl_seconds: int | None, invalidate_picks: bool = False):
+    def write(s):
+        cache_set(s, key, value, created_at=now, ttl_seconds=ttl_seconds)
+        if invalidate_picks:
+            clear_daily_picks(s)
+
+    async with get_async_sessionmaker()() as db:
+        await db.run_sync(write)
+        await db.commit()
+
+
+async def get_scoreboard_async(d: date, cache_seconds: int = 300) -> dict:
+    key = f"scoreboard:{d.isoformat()}"
+
+    async def load():
+        now = int(time.time())
+        cached, row = await _cache_read(key, cache_seconds, now)
+        if cached is not None:
+            return cached
+
+        try:
+            r = await ncaa._upstream().aget(_proxy_url(d))
+            if r.status_code == 404:
+                payload = {"games": []}
+            else:
+                r.raise_for_status()
+                payload = r.json()
+        except (UpstreamError, httpx.HTTPError, ValueError):
+            return ncaa.fallback_scoreboard(row), now - cache_seconds + ncaa.STALE_RETRY_SECONDS
+
+        await _cache_write(key, payload, now, ncaa.scoreboard_ttl(d, payload, cache_seconds))
+        return payload, now
+
+    with span("scoreboard"):
+        return await LOCAL_CACHE.aget_or_load(key, cache_seconds, load)
+
+
+async def fetch_ncaab_moneylines_cached_async(ttl_seconds: int = 300) -> list[dict]:
+    key = "odds:ncaab:h2h:us"
+
+    async def load():
+        now = int(time.time())
+        cached, row = await _cache_read(key, ttl_seconds, now)
+        if cached is not None:
+            return cached
+
+        if not odds.ODDS_API_KEY:
+            raise RuntimeError("ODDS_API_KEY is not set")
+
+        try:
+            r = await odds._upstream().aget(
+                f"{odds.ODDS_API_BASE}/v4/sports/{odds.SPORT_KEY}/odds",
+                params={
+                    "apiKey": odds.ODDS_API_KEY,
+                    "regions": "us",
+                    "markets": "h2h",
+                    "oddsFormat": "american",
+                    "dateFormat": "iso",
+                },
+            )
+            r.raise_for_status()
+        except (UpstreamError, httpx.HTTPError):
+            if row is None or now - int(row.created_at) > odds.STALE_MAX_SECONDS:
+                raise
+            inc("cache_lookups_total", kind="odds", result="stale_served")
+            return cache_value(row), now - ttl_seconds + odds.STALE_RETRY_SECONDS
+        events = r.json()
+
+        await _cache_write(key, events, now, ttl_seconds, invalidate_picks=True)
+        return events, now
+
+    with span("odds"):
+        return await LOCAL_CACHE.aget_or_load(key, ttl_seconds, load)
@@ -0,0 +1,344 @@
+"""
+Durable on-disk archive of normalized scoreboards for offline replays.
+
+One partition per season (season 2025 = Jul 2024 .. Jun 2025), stored as
+a directory with:
+  games.<generation>.npy
+              structured array, one row per game, sorted by day
+              (columns are int codes into meta's strings; partitions written
+              before game_id was added lack that column and decode it as None)
+  meta.json   {"strings": [...], "days": [covered day ordinals],
+               "games": "games.<generation>.npy"}
+
+A write adds a new games file and then replaces meta.json, the only file
+that is ever overwritten, so readers see the old partition or the new one
+and never a mix. The previous games file is kept for readers that are
+still opening it; older ones are removed. (Partitions written before
+generations have "games.npy" and no "games" key.)
+
+games.npy is memory-mapped on read, so replays stream straight from disk
+without HTTP or JSON parsing. Rows decode back to extract_games() dicts;
+scores come back as int (or None) rather than the raw upstream strings.
+
+The cache table only keeps scoreboards for the last CACHE_RETENTION_DAYS:
+purge_cache (nightly job, POST /api/admin/purge-cache) archives older
+finished days and drops them from the table.
+
+    python -m app.archive import --season 2025 --source network
+    python -m app.archive import --start 2025-01-01 --end 2025-01-31 --source cache
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .elo_update import daterange, to_int
+from .ncaa import extract_games, is_fallback, iter_game_records, prefetch_scoreboards
+from .repo import cache_get, cache_keys_before, cache_purge_expired, cache_value
+from .team_ids import legacy_id_remap
+
+ARCHIVE_DIR = os.getenv("SCOREBOARD_ARCHIVE_DIR", "./archive")
+# cached scoreboards older than this are moved to the archive by purge_cache
+CACHE_RETENTION_DAYS = int(os.getenv("SCOREBOARD_CACHE_RETENTION_DAYS", "30"))
+
+GAME_DTYPE = np.dtype([
+    ("day", "<i4"),          # date ordinal
+    ("home_id", "<i4"),      # index into strings
+    ("home_name", "<i4"),
+    ("away_id", "<i4"),
+    ("away_name", "<i4"),
+    ("status", "<i4"),
+    ("neutral", "?"),
+    ("home_score", "<i2"),   # -1 = no score
+    ("away_score", "<i2"),
+    ("game_id", "<i4"),      # index into strings, -1 = none
+])
+
+NO_SCORE = -1
+NO_ID = -1
+
+# games file of partitions written before meta.json named it
+LEGACY_GAMES = "games.npy"
+
+
+def season_for(d: date) -> int:
+    # college basketball seasons span the new year; name them by the year they end
+    return d.year + 1 if d.month >= 7 else d.year
+
+
+def season_bounds(season: int) -> tuple[date, date]:
+    return date(season - 1, 11, 1), date(season, 4, 30)
+
+
+def _partition_dir(season: int) -> str:
+    return os.path.join(ARCHIVE_DIR, str(season))
+
+
+class Partition:
+    """
+    One season's games (memory-mapped) plus its string table and covered days.
+    """
+
+    def __init__(self, games: np.ndarray, strings: list[str], days: set[int]):
+        self.games = games
+        self.strings = strings
+        self.days = days
+        self._ids: list[str] | None = None
+
+    @classmethod
+    def empty(cls) -> "Partition":
+        return cls(np.empty(0, dtype=GAME_DTYPE), [], set())
+
+    @classmethod
+    def load(cls, season: int, mmap: bool = True) -> "Partition":
+        path = _partition_dir(season)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return cls.empty()
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        games = np.load(os.path.join(path, meta.get("games", LEGACY_GAMES)), mmap_mode="r" if mmap else None)
+        if "game_id" not in games.dtype.names:
+            games = _upgrade(games)
+        return cls(games, meta["strings"], set(meta["days"]))
+
+    def day_slice(self, d: date) -> np.ndarray:
+        o = d.toordinal()
+        lo, hi = np.searchsorted(self.games["day"], [o, o + 1])
+        return self.games[lo:hi]
+
+    def _id_strings(self) -> list[str]:
+        # partitions written before the current canonicalization store the
+        # old ids; map them by the team names stored next to them
+        if self._ids is None:
+            names = np.unique(np.concatenate([self.games["home_name"], self.games["away_name"]]))
+            remap = legacy_id_remap(self.strings[i] for i in names.tolist())
+            self._ids = [remap.get(x, x) for x in self.strings]
+        return self._ids
+
+    def decode(self, rows: np.ndarray) -> list[dict]:
+        s, ids = self.strings, self._id_strings()
+        return [
+            {
+                "home_id": ids[home_id],
+                "home_name": s[home_name],
+                "away_id": ids[away_id],
+                "away_name": s[away_name],
+                "neutral": neutral,
+                "status": s[status],
+                "home_score": None if home_score == NO_SCORE else home_score,
+                "away_score": None if away_score == NO_SCORE else away_score,
+                "game_id": None if game_id == NO_ID else s[game_id],
+            }
+            for _, home_id, home_name, away_id, away_name, status, neutral, home_score, away_score, game_id in rows.tolist()
+        ]
+
+
+def _upgrade(games: np.ndarray) -> np.ndarray:
+    # older layout without game_id: copy into the current dtype
+    out = np.empty(len(games), dtype=GAME_DTYPE)
+    for name in games.dtype.names:
+        out[name] = games[name]
+    out["game_id"] = NO_ID
+    return out
+
+
+def _encode(days_games: dict[int, list[dict]], strings: list[str], index: dict[str, int]) -> np.ndarray:
+    def code(x: str) -> int:
+        if x not in index:
+            index[x] = len(strings)
+            strings.append(x)
+        return index[x]
+
+    def score(x) -> int:
+        v = to_int(x)
+        return NO_SCORE if v is None or not 0 <= v < 2**15 else v
+
+    rows = [
+        (
+            o,
+            code(g["home_id"]), code(g["home_name"]),
+            code(g["away_id"]), code(g["away_name"]),
+            code(str(g["status"])),
+            bool(g["neutral"]),
+            score(g["home_score"]), score(g["away_score"]),
+            code(g["game_id"]) if g.get("game_id") else NO_ID,
+        )
+        for o in sorted(days_games)
+        for g in days_games[o]
+    ]
+    return np.array(rows, dtype=GAME_DTYPE)
+
+
+def write_days(season: int, days_games: dict[date, list[dict]]):
+    """
+    Merge normalized games for some days into a season partition, replacing any
+    days already archived. Swapped in atomically (see the module docstring).
+    """
+    part = Partition.load(season, mmap=False)
+    new_days = {d.toordinal() for d in days_games}
+
+    keep = part.games[~np.isin(part.games["day"], list(new_days))] if len(part.games) else part.games
+    strings = list(part.strings)
+    index = {x: i for i, x in enumerate(strings)}
+    added = _encode({d.toordinal(): g for d, g in days_games.items()}, strings, index)
+
+    games = np.concatenate([keep, added])
+    games = games[np.argsort(games["day"], kind="stable")]
+
+    path = _partition_dir(season)
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, "meta.json")
+    previous = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            previous = json.load(f).get("games", LEGACY_GAMES)
+
+    name = f"games.{time.time_ns():x}.npy"
+    with open(os.path.join(path, name), "wb") as f:
+        np.save(f, games)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_meta = meta_path + ".tmp"
+    with open(tmp_meta, "w") as f:
+        json.dump({"strings": strings, "days": sorted(part.days | new_days), "games": name}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_meta, meta_path)
+
+    for old in os.listdir(path):
+        if old.startswith("games.") and old.endswith(".npy") and old not in (name, previous):
+            try:
+                os.remove(os.path.join(path, old))
+            except OSError:
+                pass  # still mapped by a reader (Windows); next write retries
+
+
+def iter_archive_days(start: date, end: date) -> Iterator[tuple[date, list[dict] | None]]:
+    """
+    Yield (day, games) for start..end inclusive from the archive; games is
+    None for days that were never archived.
+    """
+    parts: dict[int, Partition] = {}
+    for d in daterange(start, end):
+        season = season_for(d)
+        if season not in parts:
+            parts[season] = Partition.load(season)
+        part = parts[season]
+        if d.toordinal() not in part.days:
+            yield d, None
+            continue
+        yield d, part.decode(part.day_slice(d))
+
+
+def iter_cached_days(start: date, end: date) -> Iterator[tuple[date, list[dict] | None]]:
+    """
+    Same as iter_archive_days, but read from the cache table (never the network).
+    """
+    db = SessionLocal()
+    try:
+        for d in daterange(start, end):
+            row = cache_get(db, f"scoreboard:{d.isoformat()}")
+            yield d, [r.as_dict() for r in iter_game_records(cache_value(row))] if row else None
+    finally:
+        db.close()
+
+
+# ---- Importer ----
+def _source_days(start: date, end: date, source: str, workers: int, sleep_seconds: float) -> Iterable[tuple[date, list[dict] | None]]:
+    if source == "network":
+        days = daterange(start, end)
+        for d, sb, _ in prefetch_scoreboards(days, workers=workers, min_interval=sleep_seconds):
+            # a failed fetch is reported missing, not archived as an empty day
+            yield d, None if is_fallback(sb) else extract_games(sb)
+    elif source == "cache":
+        yield from iter_cached_days(start, end)
+    else:
+        raise ValueError(f"unknown source {source!r}")
+
+
+def import_range(start: date, end: date, source: str = "network", workers: int = 4, sleep_seconds: float = 0.15) -> dict:
+    """
+    Archive start..end from the network (via get_scoreboard, so the cache
+    table is used when fresh) or from the cache table only.
+    """
+    by_season: dict[int, dict[date, list[dict]]] = {}
+    missing = []
+    n_games = 0
+
+    for d, games in _source_days(start, end, source, workers, sleep_seconds):
+        if games is None:
+            missing.append(d.isoformat())
+            continue
+        by_season.setdefault(season_for(d), {})[d] = games
+        n_games += len(games)
+
+    for season, days_games in by_season.items():
+        write_days(season, days_games)
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "seasons": sorted(by_season),
+        "days_archived": sum(len(v) for v in by_season.values()),
+        "days_missing": missing,
+        "games": n_games,
+    }
+
+
+def purge_cache(db: Session, grace_seconds: int = 7 * 86400, retention_days: int = CACHE_RETENTION_DAYS) -> int:
+    """
+    repo.cache_purge_expired, plus the cached scoreboards of days more than
+    `retention_days` ago: finished days (stored without a TTL) are archived
+    first if they aren't already, partial copies are just dropped. Replays of
+    those days read the archive. Returns the number of rows deleted.
+    """
+    before = date.today() - timedelta(days=retention_days)
+    old = cache_keys_before(db, "scoreboard:", before.isoformat())
+
+    parts: dict[int, Partition] = {}
+    by_season: dict[int, dict[date, list[dict]]] = {}
+    for key, expires_at in old:
+        d = date.fromisoformat(key.split(":", 1)[1])
+        season = season_for(d)
+        if season not in parts:
+            parts[season] = Partition.load(season)
+        if expires_at is None and d.toordinal() not in parts[season].days:
+            row = cache_get(db, key)
+            by_season.setdefault(season, {})[d] = [r.as_dict() for r in iter_game_records(cache_value(row))]
+    for season, days_games in by_season.items():
+        write_days(season, days_games)
+
+    return cache_purge_expired(db, grace_seconds=grace_seconds, release=[key for key, _ in old])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scoreboard archive tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="archive a season or a date range")
+    imp.add_argument("--season", type=int)
+    imp.add_argument("--start", type=date.fromisoformat)
+    imp.add_argument("--end", type=date.fromisoformat)
+    imp.add_argument("--source", choices=["network", "cache"], default="network")
+    imp.add_argument("--workers", type=int, default=4)
+    imp.add_argument("--sleep-seconds", type=float, default=0.15)
+    args = ap.parse_args()
+
+    if args.season:
+        start, end = season_bounds(args.season)
+    elif args.start and args.end:
+        start, end = args.start, args.end
+    else:
+        ap.error("give --season or --start/--end")
+    print(json.dumps(import_range(start, end, args.source, args.workers, args.sleep_seconds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
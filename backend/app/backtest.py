@@ -0,0 +1,236 @@
+"""
+Offline backtest: replay a date range from locally stored scoreboards (the
+cache table or the scoreboard archive, never the network), make the picks the API would have made
+going into each day, then apply that day's results.
+
+Reports hit rate, Brier score, log loss and calibration per confidence bucket
+for one parameter set, or sweeps a grid of parameter sets over a process pool.
+
+    python -m app.backtest --start 2024-11-04 --end 2025-04-07 \\
+        --k 16,20,24 --home-adv 0,50,80 --processes 8
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date
+
+import numpy as np
+
+from .archive import iter_archive_days, iter_cached_days
+from .elo import CONFIDENCE_THRESHOLDS, win_prob_batch
+from .elo_update import elo_delta, final_scores
+
+_DEFAULT_THRESHOLDS = dict(CONFIDENCE_THRESHOLDS)
+
+
+@dataclass(frozen=True)
+class BacktestParams:
+    k: float = 20.0
+    home_adv: float = 50.0        # used for picks (as in /api/picks)
+    update_home_adv: float = 0.0  # used for the expected score in Elo updates
+    mov_cap: float = 25
+    mov_weight: float = 0.25
+    lock: float = _DEFAULT_THRESHOLDS["LOCK"]
+    strong: float = _DEFAULT_THRESHOLDS["STRONG"]
+    lean: float = _DEFAULT_THRESHOLDS["LEAN"]
+    base_elo: float = 1500.0
+
+    def __post_init__(self):
+        # checked here so a bad sweep fails before any worker starts
+        if not self.mov_cap > 0:
+            raise ValueError(f"mov_cap must be > 0, got {self.mov_cap}")
+        if self.k < 0 or self.mov_weight < 0:
+            raise ValueError(f"k and mov_weight must be >= 0, got k={self.k}, mov_weight={self.mov_weight}")
+        if not 0 <= self.lean <= self.strong <= self.lock <= 1:
+            raise ValueError(f"thresholds must satisfy 0 <= lean <= strong <= lock <= 1, got {self.lean}, {self.strong}, {self.lock}")
+
+
+# one day of finals as parallel columns: (home_idx, away_idx, neutral, home_won, home_score, away_score)
+DayGames = tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[int], list[int]]
+
+
+def load_days(start: date, end: date, source: str = "cache") -> tuple[list[tuple[str, DayGames]], list[str], list[str]]:
+    """
+    Read start..end from the cache table or the scoreboard archive and compact
+    finals into index arrays. Returns (days, team_ids, missing_days).
+    """
+    if source == "cache":
+        it = iter_cached_days(start, end)
+    elif source == "archive":
+        it = iter_archive_days(start, end)
+    else:
+        raise ValueError(f"unknown source {source!r}")
+
+    team_index: dict[str, int] = {}
+    days = []
+    missing = []
+
+    for d, games in it:
+        if games is None:
+            missing.append(d.isoformat())
+            continue
+
+        h, a, n, hs_, as_ = [], [], [], [], []
+        for g in games:
+            scores = final_scores(g)
+            if scores is None:
+                continue
+            h.append(team_index.setdefault(g["home_id"], len(team_index)))
+            a.append(team_index.setdefault(g["away_id"], len(team_index)))
+            n.append(bool(g.get("neutral")))
+            hs_.append(scores[0])
+            as_.append(scores[1])
+
+        if h:
+            home_won = np.array(hs_) > np.array(as_)
+            days.append((d.isoformat(), (np.array(h), np.array(a), np.array(n), home_won, hs_, as_)))
+
+    return days, list(team_index), missing
+
+
+def run_backtest(days: list[tuple[str, DayGames]], n_teams: int, params: BacktestParams, score_from: str | None = None) -> dict:
+    """
+    Replay `days` in order with `params`; days before `score_from` only warm up ratings.
+    """
+    ratings = np.full(n_teams, params.base_elo)
+    thresholds = [("LOCK", params.lock), ("STRONG", params.strong), ("LEAN", params.lean)]
+    buckets = {label: [0, 0, 0.0, 0.0] for label, _ in thresholds + [("PASS", 0.0)]}  # n, hits, sum p, sum brier
+
+    n = hits = 0
+    brier = logloss = 0.0
+    eps = 1e-12
+
+    for day_iso, (h, a, neutral, home_won, hs_, as_) in days:
+        if score_from is None or day_iso >= score_from:
+            adv = np.where(neutral, 0.0, params.home_adv)
+            p_home = win_prob_batch(ratings[h] + adv, ratings[a])
+            p_pick = np.where(p_home >= 0.5, p_home, 1 - p_home)
+            correct = (p_home >= 0.5) == home_won
+
+            outcome = home_won.astype(np.float64)
+            sq = (p_home - outcome) ** 2
+            brier += float(sq.sum())
+            p_clip = np.clip(p_home, eps, 1 - eps)
+            logloss -= float((outcome * np.log(p_clip) + (1 - outcome) * np.log(1 - p_clip)).sum())
+            n += len(h)
+            hits += int(correct.sum())
+
+            for p, c, s in zip(p_pick.tolist(), correct.tolist(), sq.tolist()):
+                label = next((lbl for lbl, t in thresholds if p >= t), "PASS")
+                b = buckets[label]
+                b[0] += 1
+                b[1] += c
+                b[2] += p
+                b[3] += s
+
+        # results are applied in order, so later games that day see earlier ones
+        for i, j, s_h, s_a, neu in zip(h.tolist(), a.tolist(), hs_, as_, neutral.tolist()):
+            adv = 0.0 if neu else params.update_home_adv
+            d_home = elo_delta(ratings[i] + adv, ratings[j], s_h, s_a, k=params.k, mov_cap=params.mov_cap, mov_weight=params.mov_weight)
+            ratings[i] += d_home
+            ratings[j] -= d_home
+
+    picked = sum(b[0] for label, b in buckets.items() if label != "PASS")
+    picked_hits = sum(b[1] for label, b in buckets.items() if label != "PASS")
+    return {
+        "params": asdict(params),
+        "games": n,
+        "hit_rate": round(hits / n, 4) if n else None,
+        "picks": picked,
+        "pick_hit_rate": round(picked_hits / picked, 4) if picked else None,
+        "brier": round(brier / n, 5) if n else None,
+        "log_loss": round(logloss / n, 5) if n else None,
+        "calibration": {
+            label: {
+                "n": b[0],
+                "mean_prob": round(b[2] / b[0], 4),
+                "hit_rate": round(b[1] / b[0], 4),
+                "brier": round(b[3] / b[0], 5),
+            } if b[0] else {"n": 0}
+            for label, b in buckets.items()
+        },
+    }
+
+
+# ---- Parameter sweeps ----
+_worker_data = None
+
+
+def _init_worker(days, n_teams, score_from):
+    global _worker_data
+    _worker_data = (days, n_teams, score_from)
+
+
+def _run_one(params: BacktestParams) -> dict:
+    days, n_teams, score_from = _worker_data
+    return run_backtest(days, n_teams, params, score_from)
+
+
+def param_grid(**values: list) -> list[BacktestParams]:
+    keys = list(values)
+    return [BacktestParams(**dict(zip(keys, combo))) for combo in itertools.product(*(values[k] for k in keys))]
+
+
+def sweep(days, n_teams: int, grid: list[BacktestParams], score_from: str | None = None, processes: int | None = None) -> list[dict]:
+    """
+    Run every parameter set in `grid` across a process pool (the replay data is
+    sent to each worker once). Results are sorted by log loss, best first.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(grid) == 1:
+        _init_worker(days, n_teams, score_from)
+        results = [_run_one(p) for p in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(days, n_teams, score_from)) as pool:
+            results = list(pool.map(_run_one, grid, chunksize=max(1, len(grid) // (processes * 4))))
+    results.sort(key=lambda r: math.inf if r["log_loss"] is None else r["log_loss"])
+    return results
+
+
+def _floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def main():
+    defaults = BacktestParams()
+    ap = argparse.ArgumentParser(description="Backtest Elo picks against stored scoreboards.")
+    ap.add_argument("--start", required=True, type=date.fromisoformat)
+    ap.add_argument("--end", required=True, type=date.fromisoformat)
+    ap.add_argument("--source", choices=["cache", "archive"], default="cache")
+    ap.add_argument("--score-from", type=date.fromisoformat, help="only score picks from this day (earlier days warm up ratings)")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--top", type=int, default=10, help="how many sweep results to print")
+    for field in ("k", "home_adv", "update_home_adv", "mov_cap", "mov_weight", "lock", "strong", "lean"):
+        ap.add_argument("--" + field.replace("_", "-"), type=_floats, default=[getattr(defaults, field)],
+                        help="comma-separated values to sweep")
+    args = ap.parse_args()
+
+    try:
+        grid = param_grid(**{
+            f: getattr(args, f)
+            for f in ("k", "home_adv", "update_home_adv", "mov_cap", "mov_weight", "lock", "strong", "lean")
+        })
+    except ValueError as e:
+        ap.error(str(e))
+
+    days, team_ids, missing = load_days(args.start, args.end, args.source)
+    score_from = args.score_from.isoformat() if args.score_from else None
+    results = sweep(days, len(team_ids), grid, score_from, args.processes)
+
+    print(json.dumps({
+        "days": len(days),
+        "missing_days": len(missing),
+        "teams": len(team_ids),
+        "combinations": len(grid),
+        "results": results[:args.top],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Monte Carlo tournament simulator on top of the Elo model.
+
+A bracket is 64 slots in bracket order (slot 0 plays slot 1, 2 plays 3, ...).
+Each slot is a team id, or a pair of team ids for a First Four game whose
+winner takes the slot, so a 68-team field is 60 single slots + 4 pairs.
+All games are neutral site (no home court bump).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from .elo import win_prob_batch
+
+BRACKET_SLOTS = 64
+ROUNDS = ["R64", "R32", "S16", "E8", "F4", "Final", "Champion"]
+MAX_SIMS = 200_000
+
+
+def parse_slots(slots: list) -> tuple[list[str], list[tuple[int, ...]]]:
+    """
+    Validate bracket slots. Returns (team_ids, slot_indexes) where
+    slot_indexes[i] holds the index (or two indexes for a play-in) into team_ids.
+    """
+    if len(slots) != BRACKET_SLOTS:
+        raise ValueError(f"bracket must have {BRACKET_SLOTS} slots, got {len(slots)}")
+
+    team_ids: list[str] = []
+    index: dict[str, int] = {}
+    slot_indexes = []
+
+    for s in slots:
+        ids = [s] if isinstance(s, str) else list(s)
+        if len(ids) not in (1, 2) or not all(isinstance(t, str) and t for t in ids):
+            raise ValueError(f"invalid bracket slot: {s!r}")
+        idxs = []
+        for t in ids:
+            if t in index:
+                raise ValueError(f"team {t} appears more than once")
+            index[t] = len(team_ids)
+            team_ids.append(t)
+            idxs.append(index[t])
+        slot_indexes.append(tuple(idxs))
+
+    return team_ids, slot_indexes
+
+
+def _play(elos: np.ndarray, a: np.ndarray, b: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    p_a = win_prob_batch(elos[a], elos[b])
+    return np.where(rng.random(a.shape) < p_a, a, b)
+
+
+def simulate_bracket(slots: list, elos: dict[str, float], sims: int = 10_000, seed: int | None = None) -> dict:
+    """
+    Run `sims` tournaments at once: every round is a single vectorized pass
+    over a (sims, games) array of team indexes.
+    elos: team id -> rating for every team in the bracket.
+    Returns {team_id: {round: probability of reaching it}}.
+    """
+    sims = int(sims)
+    if not 1 <= sims <= MAX_SIMS:
+        raise ValueError(f"sims must be between 1 and {MAX_SIMS}")
+
+    team_ids, slot_indexes = parse_slots(slots)
+    missing = [t for t in team_ids if t not in elos]
+    if missing:
+        raise ValueError(f"unknown team ids: {', '.join(missing)}")
+
+    rng = np.random.default_rng(seed)
+    rating = np.array([float(elos[t]) for t in team_ids], dtype=np.float64)
+    n_teams = len(team_ids)
+    reached = np.zeros((len(ROUNDS), n_teams), dtype=np.int64)
+
+    field = np.empty((sims, BRACKET_SLOTS), dtype=np.int32)
+    for i, idxs in enumerate(slot_indexes):
+        if len(idxs) == 1:
+            field[:, i] = idxs[0]
+        else:
+            a = np.full(sims, idxs[0], dtype=np.int32)
+            b = np.full(sims, idxs[1], dtype=np.int32)
+            field[:, i] = _play(rating, a, b, rng)
+
+    for r in range(len(ROUNDS)):
+        reached[r] = np.bincount(field.ravel(), minlength=n_teams)
+        if field.shape[1] > 1:
+            field = _play(rating, field[:, 0::2], field[:, 1::2], rng)
+
+    probs = reached / sims
+    return {
+        t: {name: round(float(probs[r, i]), 5) for r, name in enumerate(ROUNDS)}
+        for i, t in enumerate(team_ids)
+    }
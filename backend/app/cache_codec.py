@@ -0,0 +1,66 @@
+"""
+Binary encoding for cache table payloads.
+
+Payloads are stored compressed in cache.payload with a version tag in
+cache.codec. The newest codec available is used for writes (msgpack + zstd
+when both libraries are installed, otherwise JSON + zlib from the stdlib);
+every tag ever written stays decodable. Rows written before payload existed
+only have JSON text in cache.value and are read as such.
+
+The payload is the upstream response as fetched, not a normalized form:
+scoreboards are read by extract_games, extract_live_games (period and clock)
+and the archive import, odds by odds_index and build_best_price_map, each
+needing different fields. Normalized per-game data for replays lives in
+the on-disk archive (archive.py).
+"""
+import json
+import zlib
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:  # optional: smaller and faster than json+zlib
+    msgpack = zstandard = None
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON
+    orjson = None
+
+JSON_ZLIB = "json+zlib/1"
+MSGPACK_ZSTD = "msgpack+zstd/1"
+
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_loads(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def default_codec() -> str:
+    return MSGPACK_ZSTD if msgpack is not None else JSON_ZLIB
+
+
+def encode(obj, codec: str | None = None) -> tuple[bytes, str]:
+    codec = codec or default_codec()
+    if codec == MSGPACK_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(msgpack.packb(obj, use_bin_type=True)), codec
+    if codec == JSON_ZLIB:
+        return zlib.compress(_json_dumps(obj), 6), codec
+    raise ValueError(f"unknown cache codec {codec!r}")
+
+
+def decode(payload: bytes, codec: str):
+    if codec == MSGPACK_ZSTD:
+        if msgpack is None:
+            raise RuntimeError("cache entry needs msgpack and zstandard installed")
+        return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(payload), raw=False)
+    if codec == JSON_ZLIB:
+        return json_loads(zlib.decompress(payload))
+    raise ValueError(f"unknown cache codec {codec!r}")
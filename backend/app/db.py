@@ -1,22 +1,29 @@
+import logging
 import os
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+log = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ncaa.sqlite3")
 
 # Render gives postgres URLs like postgres://..., SQLAlchemy expects postgresql://...
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-connect_args = {}
+engine_kwargs = {}
 if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+    engine_kwargs["connect_args"] = {"check_same_thread": False}
+else:
+    # SQLite has no READ COMMITTED level and rejects it
+    engine_kwargs["isolation_level"] = "READ COMMITTED"
 
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
-    connect_args=connect_args,
-    isolation_level="READ COMMITTED",
+    **engine_kwargs,
 )
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
@@ -27,7 +34,91 @@ class Base(DeclarativeBase):
 def init_db():
     # Import models so metadata is registered
     from . import models  # noqa: F401
+    from .repo import SUPPORTED_DIALECTS
+    if engine.dialect.name not in SUPPORTED_DIALECTS:
+        # the repo's upserts rely on INSERT ... ON CONFLICT
+        raise RuntimeError(
+            f"unsupported database {engine.dialect.name!r} in DATABASE_URL; "
+            f"use one of: {', '.join(SUPPORTED_DIALECTS)}"
+        )
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _migrate_team_ids()
+    _migrate_catch_up_cutover()
+
+def _add_missing_columns():
+    """
+    create_all() never alters existing tables; add any nullable columns that
+    were added to a model after its table was created.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+
+def _migrate_team_ids():
+    """
+    Rename teams stored under the ids the old replace-based canonicalizer
+    produced ("state-bonaventure") to the current ones ("saint-bonaventure"),
+    so their ratings and history carry over. A no-op once done.
+    """
+    from .repo import remap_team_ids
+    from .models import Team
+    from .team_ids import legacy_id_remap
+
+    db = SessionLocal()
+    try:
+        remap = legacy_id_remap(name for (name,) in db.query(Team.name))
+        renamed = remap_team_ids(db, remap) if remap else 0
+        db.commit()
+    finally:
+        db.close()
+    if renamed:
+        log.warning("renamed %d team ids from the old canonical form", renamed)
+
+def _migrate_catch_up_cutover():
+    """
+    The cron job used to apply yesterday's games without recording the day
+    (elo_runs) or the games (games table), so the first catch-up on such a
+    deployment would apply those days again. Once, on a database with ratings
+    but no recorded games, mark every day since the last recorded one through
+    yesterday as processed. Ratings stay as the old job left them; a rebuild
+    recomputes them exactly.
+    """
+    from datetime import date, timedelta
+    from .models import Team
+    from .repo import bulk_mark_days_processed, has_applied_games, last_processed_day, migration_applied, record_migration
+
+    name = "catch_up_cutover"
+    days = []
+    db = SessionLocal()
+    try:
+        if migration_applied(db, name):
+            return
+        if db.query(Team.id).first() is not None and not has_applied_games(db):
+            until = date.today() - timedelta(days=1)
+            last = last_processed_day(db)
+            d = date.fromisoformat(last) + timedelta(days=1) if last else until
+            while d <= until:
+                days.append(d.isoformat())
+                d += timedelta(days=1)
+            bulk_mark_days_processed(db, days)
+        record_migration(db, name)
+        db.commit()
+    finally:
+        db.close()
+    if days:
+        log.warning(
+            "marked %d days (%s..%s) processed as already applied by the old cron job; "
+            "run a rebuild to recompute their ratings exactly", len(days), days[0], days[-1],
+        )
 
 def get_db():
     db = SessionLocal()
@@ -35,3 +126,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# ---- Async (used by the async request handlers) ----
+# Same database, async driver: aiosqlite for SQLite, asyncpg for Postgres.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str = DATABASE_URL):
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"no async driver configured for {backend}")
+    u = u.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "postgresql" and "sslmode" in u.query:
+        # asyncpg spells libpq's sslmode as ssl
+        ssl = u.query["sslmode"]
+        u = u.difference_update_query(["sslmode"]).update_query_dict({"ssl": ssl})
+    return u
+
+@lru_cache(maxsize=1)
+def get_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url()
+    kwargs = {"pool_pre_ping": True}
+    if url.get_backend_name() == "postgresql":
+        kwargs["isolation_level"] = "READ COMMITTED"
+    return create_async_engine(url, **kwargs)
+
+@lru_cache(maxsize=1)
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    return async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
+
+async def dispose_async_engine():
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
@@ -1,12 +1,100 @@
 import math
+from statistics import NormalDist
+
+import numpy as np
+
+# (label, minimum win probability), checked top-down
+CONFIDENCE_THRESHOLDS = (
+    ("LOCK", 0.85),
+    ("STRONG", 0.75),
+    ("LEAN", 0.65),
+)
+
+# home court bump, in rating points
+HOME_ADV = 50.0
 
 def win_prob(elo_a: float, elo_b: float) -> float:
-    # Probability team A beats team B
-    return 1 / (1 + 10 ** ((elo_b - elo_a) / 400))
+    # Probability team A beats team B.
+    # np.power (not the ** operator) so scalar and batch results are bit-identical.
+    return 1 / (1 + float(np.power(10.0, (elo_b - elo_a) / 400)))
 
-def pick_winner(home_elo: float, away_elo: float, home_adv: float = 50.0):
+def pick_winner(home_elo: float, away_elo: float, home_adv: float = HOME_ADV):
     # simple home court bump
     p_home = win_prob(home_elo + home_adv, away_elo)
     if p_home >= 0.5:
         return "HOME", p_home
     return "AWAY", 1 - p_home
+
+def confidence_label(prob: float) -> str:
+    for label, threshold in CONFIDENCE_THRESHOLDS:
+        if prob >= threshold:
+            return label
+    return "PASS"
+
+# ---- Live (in-game) ----
+# standard deviation of the final margin over a full 40-minute game, in points
+LIVE_MARGIN_SD = 11.0
+GAME_SECONDS = 40 * 60
+_NORMAL = NormalDist()
+
+def live_win_prob(p_pregame: float, lead: float, seconds_left: float, margin_sd: float = LIVE_MARGIN_SD) -> float:
+    """
+    Home win probability during a game, blending the pregame (Elo) probability
+    with the current lead (home minus away) and time left.
+    The final margin is modelled as normal: the pregame probability implies
+    an expected full-game margin, of which the remaining share is still to
+    come, with variance proportional to the time left. At tip-off this gives
+    back p_pregame; as the clock runs down the lead takes over.
+    """
+    p = min(max(p_pregame, 1e-6), 1 - 1e-6)
+    expected_margin = margin_sd * _NORMAL.inv_cdf(p)
+    if seconds_left <= 0:
+        if lead:
+            return 1.0 if lead > 0 else 0.0
+        seconds_left = 5 * 60  # tied at the horn: overtime
+    share = min(seconds_left, GAME_SECONDS) / GAME_SECONDS
+    return _NORMAL.cdf((lead + expected_margin * share) / (margin_sd * math.sqrt(share)))
+
+# ---- Batch (NumPy) ----
+def win_prob_batch(elo_a, elo_b) -> np.ndarray:
+    """
+    Vectorized win_prob over arrays of ratings; same formula, same float ops.
+    """
+    elo_a = np.asarray(elo_a, dtype=np.float64)
+    elo_b = np.asarray(elo_b, dtype=np.float64)
+    return 1 / (1 + np.power(10.0, (elo_b - elo_a) / 400))
+
+def win_prob_matrix(elos, adv: float = 0.0) -> np.ndarray:
+    """
+    Pairwise win_prob over one array of ratings: element [i, j] is the
+    probability team i beats team j, with `adv` added to team i's rating
+    (HOME_ADV for i at home, -HOME_ADV for i away, 0 on a neutral floor).
+    """
+    elos = np.asarray(elos, dtype=np.float64)
+    return win_prob_batch(elos[:, None] + adv, elos[None, :])
+
+def confidence_labels(probs) -> np.ndarray:
+    probs = np.asarray(probs, dtype=np.float64)
+    conds = [probs >= t for _, t in CONFIDENCE_THRESHOLDS]
+    return np.select(conds, [label for label, _ in CONFIDENCE_THRESHOLDS], default="PASS")
+
+def pick_winner_batch(home_elo, away_elo, neutral=None, home_adv: float = HOME_ADV):
+    """
+    Score a whole slate at once.
+    neutral: optional bool array; neutral-site games get no home court bump.
+    Returns (sides, probs, labels) arrays where sides are "HOME"/"AWAY",
+    probs the picked side's win probability and labels the confidence label.
+    Element i matches pick_winner()/confidence_label() for game i exactly.
+    """
+    home_elo = np.asarray(home_elo, dtype=np.float64)
+    away_elo = np.asarray(away_elo, dtype=np.float64)
+    if neutral is None:
+        adv = np.full(home_elo.shape, float(home_adv))
+    else:
+        adv = np.where(np.asarray(neutral, dtype=bool), 0.0, float(home_adv))
+
+    p_home = win_prob_batch(home_elo + adv, away_elo)
+    is_home = p_home >= 0.5
+    sides = np.where(is_home, "HOME", "AWAY")
+    probs = np.where(is_home, p_home, 1 - p_home)
+    return sides, probs, confidence_labels(probs)
@@ -2,17 +2,42 @@ from __future__ import annotations
 
 from datetime import date, timedelta
 import time
+from typing import Callable
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from .db import SessionLocal
 from .elo import win_prob
+from .metrics import inc, observe, span
 from .repo import (
-    get_or_create_team,
-    set_team_elo,
-    reset_all_elos,
-    mark_day_processed,
+    resolve_teams,
+    clear_daily_picks,
     clear_processed_days,
+    is_day_processed,
+    mark_day_processed,
+    last_processed_day,
+    processed_days_between,
+    load_team_ratings,
+    bulk_upsert_teams,
+    bulk_mark_days_processed,
+    record_rating_history,
+    bulk_insert_rating_history,
+    save_rating_snapshot,
+    clear_rating_history,
+    claim_games,
+    set_game_deltas,
+    bulk_insert_games,
+    clear_games,
+    lock_teams,
+    bump_ratings_version,
 )
-from .ncaa import get_scoreboard, extract_games
+from .ncaa import extract_games, is_fallback, prefetch_scoreboards
+from .ratings_store import RATINGS
+
+# full rating snapshots are taken on days whose ordinal is a multiple of this,
+# so an as-of lookup replays at most this many days of history rows
+SNAPSHOT_EVERY_DAYS = 7
 
 
 def to_int(x):
@@ -27,107 +52,452 @@ def to_int(x):
         return None
 
 
-def elo_delta(elo_a: float, elo_b: float, score_a: int, score_b: int, k: float = 20.0) -> float:
+def elo_delta(
+    elo_a: float,
+    elo_b: float,
+    score_a: int,
+    score_b: int,
+    k: float = 20.0,
+    mov_cap: float = 25,
+    mov_weight: float = 0.25,
+) -> float:
     """
     Returns change to team A Elo. Team B gets -delta.
-    Simple Elo with a light margin-of-victory multiplier.
+    Simple Elo with a light margin-of-victory multiplier
+    (margins are capped at mov_cap points, worth up to +mov_weight).
     """
     expected = win_prob(elo_a, elo_b)
     actual = 1.0 if score_a > score_b else 0.0
 
     margin = abs(score_a - score_b)
-    mov_mult = 1.0 + min(margin, 25) / 25.0 * 0.25  # up to +25%
+    mov_mult = 1.0 + min(margin, mov_cap) / mov_cap * mov_weight  # up to +25% by default
     return k * mov_mult * (actual - expected)
 
 
-def update_elo_from_games(games: list[dict]) -> dict:
+def final_scores(g: dict) -> tuple[int, int] | None:
     """
-    games items must include:
-    home_id, away_id, home_name, away_name, status, home_score, away_score
+    (home_score, away_score) for a finished game with usable scores, else None.
+    """
+    status = (g.get("status") or "").strip().lower()
+    is_final = ("final" in status) or (status in ("final", "closed", "complete"))
+    if not is_final:
+        return None
+
+    hs = to_int(g.get("home_score"))
+    as_ = to_int(g.get("away_score"))
+    if hs is None or as_ is None:
+        return None
+    return hs, as_
+
+
+@span("elo.apply_games")
+def apply_games(
+    ratings: dict[str, float],
+    names: dict[str, str],
+    games: list[dict],
+    base_elo: float = 1500.0,
+    applied: list | None = None,
+) -> int:
+    """
+    Apply final games to an in-memory rating table (team id -> elo), in order.
+    Unknown teams start at base_elo. Mirrors update_elo_from_games without
+    touching the database; returns the number of games applied. With
+    `applied`, appends (game, home_elo, away_elo, home_delta) per game.
     """
     updated = 0
+    for g in games:
+        scores = final_scores(g)
+        if scores is None:
+            continue
+        hs, as_ = scores
 
-    db = SessionLocal()
-    try:
-        for g in games:
-            status = (g.get("status") or "").strip().lower()
-            is_final = ("final" in status) or (status in ("final", "closed", "complete"))
-            if not is_final:
-                continue
+        for team_id, name in ((g["home_id"], g["home_name"]), (g["away_id"], g["away_name"])):
+            if team_id not in ratings:
+                ratings[team_id] = base_elo
+                names[team_id] = name
+            elif name:
+                names[team_id] = name
 
-            hs = to_int(g.get("home_score"))
-            as_ = to_int(g.get("away_score"))
-            if hs is None or as_ is None:
-                continue
+        home_elo = ratings[g["home_id"]]
+        away_elo = ratings[g["away_id"]]
+        d_home = elo_delta(home_elo, away_elo, hs, as_)
+        ratings[g["home_id"]] = home_elo + d_home
+        ratings[g["away_id"]] = away_elo - d_home
+        if applied is not None:
+            applied.append((g, home_elo, away_elo, d_home))
 
-            home = get_or_create_team(db, g["home_id"], g["home_name"])
-            away = get_or_create_team(db, g["away_id"], g["away_name"])
+        updated += 1
+    return updated
 
-            d_home = elo_delta(home.elo, away.elo, hs, as_)
-            set_team_elo(db, home.id, home.elo + d_home)
-            set_team_elo(db, away.id, away.elo - d_home)
 
-            updated += 1
+def game_key(g: dict, day: date | None = None) -> str:
+    """
+    games-table id: the upstream gameID, or a stand-in built from the day
+    and teams for payloads without one.
+    """
+    if g.get("game_id"):
+        return str(g["game_id"])
+    return f"{day.isoformat() if day else ''}:{g['home_id']}:{g['away_id']}"
 
-        db.commit()
-        return {"games_updated": updated}
+
+def unseen_finals(games: list[dict], day: date | None, seen: set[str]) -> list[tuple[str, dict]]:
+    """
+    (key, game) for final games whose key is not in `seen`, in order; adds
+    their keys to `seen`. Repeats within `games` count once.
+    """
+    out = []
+    for g in games:
+        if final_scores(g) is None:
+            continue
+        key = game_key(g, day)
+        if key not in seen:
+            seen.add(key)
+            out.append((key, g))
+    return out
+
+
+def game_rows(keyed: list[tuple[str, dict]], day: date | None, applied: list | None = None) -> list[dict]:
+    """
+    games-table rows for (key, game) pairs; with `applied` (from apply_games,
+    same order) including the ratings and delta.
+    """
+    day_iso = day.isoformat() if day else None
+    rows = []
+    for i, (key, g) in enumerate(keyed):
+        hs, as_ = final_scores(g)
+        row = {"id": key, "day": day_iso, "home_id": g["home_id"], "away_id": g["away_id"], "home_score": hs, "away_score": as_}
+        if applied is not None:
+            _, home_elo, away_elo, d_home = applied[i]
+            row.update(home_elo=home_elo, away_elo=away_elo, home_delta=d_home)
+        rows.append(row)
+    return rows
+
+
+def games_played(games: list[dict]) -> dict[str, int]:
+    """
+    team id -> number of final games it played in `games`.
+    """
+    counts: dict[str, int] = {}
+    for g in games:
+        if final_scores(g) is None:
+            continue
+        for team_id in (g["home_id"], g["away_id"]):
+            counts[team_id] = counts.get(team_id, 0) + 1
+    return counts
+
+
+def is_snapshot_day(d: date) -> bool:
+    return d.toordinal() % SNAPSHOT_EVERY_DAYS == 0
+
+
+def _apply_games_db(db: Session, games: list[dict], day: date | None = None) -> tuple[int, int]:
+    """
+    Apply final games to the teams table inside the caller's transaction.
+    Games already in the games table are skipped: the unseen ones are
+    claimed with one bulk insert and only those are applied, so overlapping
+    or repeated runs never apply a game twice. With `day`, also records the
+    rating history for that day. Returns (applied, already_applied).
+    """
+    finals = unseen_finals(games, day, set())
+    claimed = claim_games(db, game_rows(finals, day))
+    todo = [(key, g) for key, g in finals if key in claimed]
+    todo_games = [g for _, g in todo]
+
+    updated = 0
+    if todo:
+        teams = {}
+        for g in todo_games:
+            teams[g["home_id"]] = g["home_name"]
+            teams[g["away_id"]] = g["away_name"]
+        resolve_teams(db, teams)
+        rows = lock_teams(db, teams)
+
+        ratings = {team_id: t.elo for team_id, t in rows.items()}
+        names = {team_id: t.name for team_id, t in rows.items()}
+        applied = []
+        updated = apply_games(ratings, names, todo_games, applied=applied)
+
+        for team_id, t in rows.items():
+            if ratings[team_id] != t.elo:
+                t.elo = ratings[team_id]
+        set_game_deltas(db, [
+            {"id": key, "home_elo": home_elo, "away_elo": away_elo, "home_delta": d_home}
+            for (key, _), (_, home_elo, away_elo, d_home) in zip(todo, applied)
+        ])
+        bump_ratings_version(db)
+
+    if day is not None:
+        if updated:
+            record_rating_history(db, day.isoformat(), ratings, games_played(todo_games))
+        if is_snapshot_day(day):
+            db.flush()
+            save_rating_snapshot(db, day.isoformat(), load_team_ratings(db)[0])
+
+    if updated:
+        clear_daily_picks(db)
+    return updated, len(finals) - len(todo)
+
+
+def update_elo_from_games(games: list[dict], day: date | None = None) -> dict:
+    """
+    games items must include:
+    home_id, away_id, home_name, away_name, status, home_score, away_score
+    (and game_id when the upstream provides one).
+    Pass the games' `day` to record rating history. Safe to call repeatedly
+    for the same games, e.g. every few minutes on a game night.
+    """
+    db = SessionLocal()
+    try:
+        with span("elo.update"):
+            updated, skipped = _apply_games_db(db, games, day)
+            db.commit()
+        RATINGS.invalidate()
+        inc("elo_games_applied_total", updated, source="update")
+        return {"games_updated": updated, "games_already_applied": skipped}
     finally:
         db.close()
 
 
-def rebuild_elo_range(start: date, end: date, sleep_seconds: float = 0.15) -> dict:
+def daterange(start: date, end: date):
+    d = start
+    while d <= end:
+        yield d
+        d += timedelta(days=1)
+
+
+def _network_days(start: date, end: date, sleep_seconds: float, workers: int):
+    # (day, games, fetch seconds, parse seconds)
+    days = daterange(start, end)
+    for d, sb, fetch_seconds in prefetch_scoreboards(days, workers=workers, min_interval=sleep_seconds):
+        if is_fallback(sb):
+            # upstream failed: report the day missing rather than replay a partial one
+            yield d, None, fetch_seconds, 0.0
+            continue
+        t0 = time.perf_counter()
+        games = extract_games(sb)
+        yield d, games, fetch_seconds, time.perf_counter() - t0
+
+
+def _archive_days(start: date, end: date):
+    # imported here: archive.py builds on this module
+    from .archive import iter_archive_days
+
+    it = iter_archive_days(start, end)
+    while True:
+        t0 = time.perf_counter()
+        item = next(it, None)
+        if item is None:
+            return
+        yield item[0], item[1], time.perf_counter() - t0, 0.0
+
+
+def rebuild_elo_range(
+    start: date,
+    end: date,
+    sleep_seconds: float = 0.15,
+    workers: int = 4,
+    source: str = "network",
+    progress: Callable[..., None] | None = None,
+) -> dict:
     """
     Rebuild Elo by replaying games from start..end inclusive.
     - Resets existing team elos to 1500
     - Clears elo_runs and then records each day as processed
+    - Scoreboards are prefetched by `workers` threads, starting at most one
+      upstream request every `sleep_seconds`; games are still applied one day
+      at a time in date order, so ratings match a serial replay exactly.
+    - Days whose scoreboard could not be fetched (ncaa.is_fallback) are
+      skipped and reported in days_missing.
+    - source="archive" streams days from the local scoreboard archive instead
+      (no HTTP); days missing from the archive are skipped and reported.
+    - Teams are loaded once and every game is replayed against an in-memory
+      rating table; final ratings, elo_runs, the rating history and the games
+      table (rebuilt from scratch; a game seen on two days counts once) are
+      written back in a single transaction at the end.
+    - progress(days_done=, days_total=, games_applied=) is called after each
+      day; an exception raised from it aborts the rebuild before anything is
+      written.
     """
     if end < start:
         return {"ok": False, "error": "end must be >= start"}
+    if source == "network":
+        days = _network_days(start, end, sleep_seconds, workers)
+    elif source == "archive":
+        days = _archive_days(start, end)
+    else:
+        return {"ok": False, "error": "source must be 'network' or 'archive'"}
+
+    t_start = time.perf_counter()
 
     db = SessionLocal()
     try:
-        reset_count = reset_all_elos(db, 1500.0)
-        clear_processed_days(db)
-        db.commit()
+        ratings, names = load_team_ratings(db)
     finally:
         db.close()
 
-    processed_days = 0
+    reset_count = len(ratings)
+    ratings = dict.fromkeys(ratings, 1500.0)
+
+    processed = []
+    missing = []
+    history = []
+    snapshots = []
+    seen: set[str] = set()
+    applied_rows = []
     total_games_updated = 0
     days_with_updates = 0
+    timings = {"fetch": 0.0, "parse": 0.0, "apply": 0.0}
 
-    d = start
-    while d <= end:
-        day_iso = d.isoformat()
-
-        sb = get_scoreboard(d)
-        games = extract_games(sb)
+    days_total = (end - start).days + 1
+    for d, games, fetch_seconds, parse_seconds in days:
+        timings["fetch"] += fetch_seconds
+        timings["parse"] += parse_seconds
+        if games is None:
+            missing.append(d.isoformat())
+            if progress:
+                progress(days_done=len(processed) + len(missing), days_total=days_total, games_applied=total_games_updated)
+            continue
 
-        result = update_elo_from_games(games)
-        games_updated = int(result.get("games_updated", 0))
+        t1 = time.perf_counter()
+        finals = unseen_finals(games, d, seen)
+        day_games = [g for _, g in finals]
+        applied = []
+        games_updated = apply_games(ratings, names, day_games, applied=applied)
+        applied_rows += game_rows(finals, d, applied)
+        day_iso = d.isoformat()
+        for team_id, n in games_played(day_games).items():
+            history.append({"team_id": team_id, "day": day_iso, "elo": ratings[team_id], "games": n})
+        if is_snapshot_day(d):
+            snapshots.append((day_iso, dict(ratings)))
+        timings["apply"] += time.perf_counter() - t1
 
         if games_updated > 0:
             days_with_updates += 1
 
         total_games_updated += games_updated
-        processed_days += 1
+        processed.append(d.isoformat())
+        if progress:
+            progress(days_done=len(processed) + len(missing), days_total=days_total, games_applied=total_games_updated)
+
+    t0 = time.perf_counter()
+    db = SessionLocal()
+    try:
+        bulk_upsert_teams(db, ratings, names)
+        clear_processed_days(db)
+        bulk_mark_days_processed(db, processed)
+        clear_rating_history(db)
+        bulk_insert_rating_history(db, history)
+        clear_games(db)
+        bulk_insert_games(db, applied_rows)
+        for day_iso, snap in snapshots:
+            save_rating_snapshot(db, day_iso, snap)
+        clear_daily_picks(db)
+        bump_ratings_version(db)
+        db.commit()
+    finally:
+        db.close()
+    RATINGS.invalidate()
+    timings["write"] = time.perf_counter() - t0
+
+    timings["total"] = time.perf_counter() - t_start
+    for phase in ("fetch", "parse", "apply", "write"):
+        observe("span_seconds", timings[phase], span=f"elo.rebuild.{phase}")
+    inc("elo_games_applied_total", total_games_updated, source="rebuild")
+
+    return {
+        "ok": True,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "teams_reset": reset_count,
+        "days_processed": len(processed),
+        "days_missing": missing,
+        "days_with_updates": days_with_updates,
+        "games_updated": total_games_updated,
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+    }
+
+
+def catch_up_elo(
+    until: date | None = None,
+    start: date | None = None,
+    sleep_seconds: float = 0.15,
+    workers: int = 4,
+    progress: Callable[..., None] | None = None,
+) -> dict:
+    """
+    Apply every day that has no elo_runs row yet, oldest first, up to `until`
+    (default: yesterday). Starts the day after the latest elo_runs row, or at
+    `start` if given (which also fills gaps before it); with no history and
+    no start it only processes `until`.
+    Each day's rating changes and its elo_runs row commit together, and days
+    already marked processed are skipped, so reruns never double-apply.
+    (Days the old cron job applied without an elo_runs row are marked once by
+    db._migrate_catch_up_cutover; rebuild to recompute them exactly.)
+    The run stops at the first day whose scoreboard could not be fetched
+    (ncaa.is_fallback): that day and the rest are left unprocessed, listed
+    in days_missing, and picked up by the next run in order.
+    progress(days_done=, days_total=, games_applied=) is called between days;
+    an exception raised from it stops the run with the days so far committed.
+    """
+    until = until or (date.today() - timedelta(days=1))
+
+    db = SessionLocal()
+    try:
+        if start is None:
+            last = last_processed_day(db)
+            start = date.fromisoformat(last) + timedelta(days=1) if last else until
+        done = processed_days_between(db, start.isoformat(), until.isoformat())
+    finally:
+        db.close()
+
+    todo = [d for d in daterange(start, until) if d.isoformat() not in done]
+
+    processed = []
+    skipped = []
+    missing = []
+    games_updated = 0
+
+    for d, sb, _ in prefetch_scoreboards(todo, workers=workers, min_interval=sleep_seconds):
+        if progress:
+            progress(days_done=len(processed) + len(skipped), days_total=len(todo), games_applied=games_updated)
+        day_iso = d.isoformat()
+        if is_fallback(sb):
+            # applying later days first would change the ratings; stop here
+            missing = [x.isoformat() for x in todo if x >= d]
+            break
+        games = extract_games(sb)
 
         db = SessionLocal()
         try:
+            # re-check inside the day's transaction in case another run got here first
+            if is_day_processed(db, day_iso):
+                skipped.append(day_iso)
+                continue
             mark_day_processed(db, day_iso)
-            db.commit()
+            db.flush()
+            with span("elo.catch_up_day"):
+                n, _ = _apply_games_db(db, games, d)
+                db.commit()
+            RATINGS.invalidate()
+        except IntegrityError:
+            db.rollback()
+            skipped.append(day_iso)
+            continue
         finally:
             db.close()
 
-        d += timedelta(days=1)
-        time.sleep(sleep_seconds)
+        inc("elo_games_applied_total", n, source="catch_up")
+        games_updated += n
+        processed.append(day_iso)
 
+    if progress:
+        progress(days_done=len(processed) + len(skipped), days_total=len(todo), games_applied=games_updated)
     return {
         "ok": True,
         "start": start.isoformat(),
-        "end": end.isoformat(),
-        "teams_reset": reset_count,
-        "days_processed": processed_days,
-        "days_with_updates": days_with_updates,
-        "games_updated": total_games_updated,
+        "until": until.isoformat(),
+        "days_processed": processed,
+        "days_skipped": skipped,
+        "days_missing": missing,
+        "games_updated": games_updated,
     }
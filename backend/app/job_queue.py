@@ -0,0 +1,301 @@
+"""
+In-process background jobs for the slow admin operations (rebuild, catch-up,
+single-day update), so the HTTP request returns a job id at once.
+
+Jobs run on a small thread pool (JOB_WORKERS). Their state lives in the jobs
+table, so any instance can report on them: status, days processed, games
+applied and an ETA while running. Rebuild and catch-up rewrite the same
+ratings, so at most one of them is queued or running at a time (enforced by a
+unique key in the table, across instances). Cancellation is cooperative: a
+running job stops at its next progress report; a rebuild that is cancelled
+writes nothing.
+
+Jobs do not survive a restart. Each job records the process that owns it
+(WORKER_ID), and every process with a queue heartbeats in the job_workers
+table every HEARTBEAT_SECONDS. Jobs of a process silent for
+JOB_STALE_SECONDS are marked failed the next time a job is submitted, on
+any instance. On shutdown a process cancels its own queued jobs and asks its
+running ones to stop.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal
+from .elo_update import catch_up_elo, rebuild_elo_range, update_elo_from_games
+from .models import Job
+from .ncaa import extract_games, get_scoreboard, is_fallback
+from .repo import (
+    active_job,
+    cancel_owned_jobs,
+    create_job,
+    fail_stale_jobs,
+    finish_job,
+    request_job_cancel,
+    start_job,
+    update_job_progress,
+    worker_heartbeat,
+)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+HEARTBEAT_SECONDS = 30.0
+WORKER_ID = uuid.uuid4().hex
+# seconds between progress writes (the first and last are always written)
+PROGRESS_EVERY = 1.0
+
+# kind -> exclusivity key; kinds sharing a key never run concurrently
+EXCLUSIVE = {"rebuild": "elo", "catch_up": "elo"}
+
+
+class JobConflict(Exception):
+    def __init__(self, job_id: str):
+        super().__init__(f"job {job_id} is already queued or running")
+        self.job_id = job_id
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _run_rebuild(params: dict, progress) -> dict:
+    result = rebuild_elo_range(
+        date.fromisoformat(params["start"]),
+        date.fromisoformat(params["end"]),
+        sleep_seconds=params.get("sleep_seconds", 0.15),
+        workers=params.get("workers", 4),
+        source=params.get("source", "network"),
+        progress=progress,
+    )
+    if not result.get("ok"):
+        raise ValueError(result.get("error", "rebuild failed"))
+    return result
+
+
+def _run_catch_up(params: dict, progress) -> dict:
+    return catch_up_elo(
+        until=date.fromisoformat(params["until"]) if params.get("until") else None,
+        start=date.fromisoformat(params["start"]) if params.get("start") else None,
+        progress=progress,
+    )
+
+
+def _run_update(params: dict, progress) -> dict:
+    d = date.fromisoformat(params["day"])
+    progress(days_done=0, days_total=1, games_applied=0)
+    sb = get_scoreboard(d)
+    if is_fallback(sb):
+        raise RuntimeError(f"scoreboard for {d.isoformat()} is unavailable")
+    games = extract_games(sb)
+    if not games:
+        progress(days_done=1, days_total=1, games_applied=0)
+        return {"games_updated": 0, "note": "No games found."}
+    result = update_elo_from_games(games, day=d)
+    progress(days_done=1, days_total=1, games_applied=result["games_updated"])
+    return result
+
+
+RUNNERS = {"rebuild": _run_rebuild, "catch_up": _run_catch_up, "update": _run_update}
+
+
+class _Progress:
+    """
+    Progress callback for a running job: throttled writes to the jobs table,
+    raising JobCancelled once cancellation was requested.
+    """
+
+    def __init__(self, job_id: str, cancel: threading.Event):
+        self.job_id = job_id
+        self.cancel = cancel
+        self._last = 0.0
+
+    def __call__(self, days_done: int, days_total: int | None, games_applied: int):
+        now = time.monotonic()
+        if now - self._last >= PROGRESS_EVERY or days_done == days_total or not self._last:
+            self._last = now
+            db = SessionLocal()
+            try:
+                if update_job_progress(db, self.job_id, days_done, days_total, games_applied):
+                    self.cancel.set()
+                db.commit()
+            finally:
+                db.close()
+        if self.cancel.is_set():
+            raise JobCancelled()
+
+
+_executor: ThreadPoolExecutor | None = None
+_cancel_events: dict[str, threading.Event] = {}
+_lock = threading.Lock()
+_heartbeat: threading.Thread | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="job")
+        return _executor
+
+
+def _beat():
+    db = SessionLocal()
+    try:
+        worker_heartbeat(db, WORKER_ID)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _heartbeat_loop():
+    # daemon: keeps beating while the interpreter joins running jobs at exit
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        try:
+            _beat()
+        except Exception:
+            pass  # next beat retries; a long outage makes our jobs stale, as it should
+
+
+def _ensure_heartbeat():
+    global _heartbeat
+    with _lock:
+        if _heartbeat is not None:
+            return
+        _beat()
+        _heartbeat = threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True)
+        _heartbeat.start()
+
+
+def submit(kind: str, params: dict) -> dict:
+    """
+    Queue a job and return its status; raises JobConflict if an exclusive job of the same group is
+    already queued or running.
+    """
+    if kind not in RUNNERS:
+        raise ValueError(f"unknown job kind {kind!r}")
+    exclusive = EXCLUSIVE.get(kind)
+    job_id = uuid.uuid4().hex
+
+    _ensure_heartbeat()
+    db = SessionLocal()
+    try:
+        fail_stale_jobs(db, time.time() - STALE_SECONDS)
+        db.commit()
+        try:
+            job = create_job(db, job_id, kind, json.dumps(params), exclusive, owner=WORKER_ID)
+            db.commit()
+            queued = job_status(job)
+        except IntegrityError:
+            db.rollback()
+            other = active_job(db, exclusive)
+            raise JobConflict(other.id if other else "?")
+    finally:
+        db.close()
+
+    with _lock:
+        _cancel_events[job_id] = threading.Event()
+    _get_executor().submit(_run, job_id, kind, params)
+    return queued
+
+
+def _run(job_id: str, kind: str, params: dict):
+    cancel = _cancel_events[job_id]
+    try:
+        db = SessionLocal()
+        try:
+            started = start_job(db, job_id)
+            db.commit()
+        finally:
+            db.close()
+        if not started:
+            return  # cancelled while queued
+
+        status, result, error = "succeeded", None, None
+        try:
+            result = json.dumps(RUNNERS[kind](params, _Progress(job_id, cancel)))
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+
+        db = SessionLocal()
+        try:
+            finish_job(db, job_id, status, result, error)
+            db.commit()
+        finally:
+            db.close()
+    finally:
+        with _lock:
+            _cancel_events.pop(job_id, None)
+
+
+def cancel(job_id: str) -> str | None:
+    """
+    Request cancellation; returns the job's status afterwards, None if unknown.
+    """
+    with _lock:
+        event = _cancel_events.get(job_id)
+    if event is not None:
+        event.set()
+
+    db = SessionLocal()
+    try:
+        status = request_job_cancel(db, job_id)
+        db.commit()
+        return status
+    finally:
+        db.close()
+
+
+def job_status(job: Job) -> dict:
+    eta = None
+    if job.status == "running" and job.days_total and job.days_done:
+        elapsed = time.time() - job.started_at
+        eta = round(elapsed / job.days_done * (job.days_total - job.days_done), 1)
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "days_done": job.days_done,
+        "days_total": job.days_total,
+        "games_applied": job.games_applied,
+        "eta_seconds": eta,
+        "cancel_requested": bool(job.cancel_requested),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def shutdown():
+    """
+    Stop accepting work: cancel this process's queued jobs (releasing their
+    exclusive keys) and ask running ones to stop (they are reported as
+    cancelled at their next progress report).
+    """
+    global _executor
+    with _lock:
+        for event in _cancel_events.values():
+            event.set()
+        executor, _executor = _executor, None
+    if executor is None:
+        return
+    executor.shutdown(wait=False, cancel_futures=True)
+    db = SessionLocal()
+    try:
+        cancel_owned_jobs(db, WORKER_ID)
+        db.commit()
+    finally:
+        db.close()
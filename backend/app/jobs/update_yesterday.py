@@ -1,35 +1,49 @@
 from datetime import date, timedelta
 import sys
 
-from app.db import init_db
-from app.ncaa import get_scoreboard, extract_games
-from app.elo_update import update_elo_from_games
+from app.db import init_db, SessionLocal
+from app.elo_update import catch_up_elo
+from app.picks import build_daily_picks
+from app.archive import purge_cache
 
 
 def main():
     init_db()
 
     d = date.today() - timedelta(days=1)
-    print(f"[cron] Running Elo update for {d.isoformat()}")
+    print(f"[cron] Catching up Elo through {d.isoformat()}")
 
     try:
-        sb = get_scoreboard(d)
-        games = extract_games(sb)
+        # Applies every unprocessed day since the last run, so missed runs
+        # are filled in and reruns are no-ops.
+        result = catch_up_elo(until=d)
+        print(f"[cron] Elo update complete: {result}")
+        if result["days_missing"]:
+            # left unprocessed; the next run retries them
+            print(f"[cron][WARN] Scoreboards unavailable, not applied yet: {', '.join(result['days_missing'])}")
     except Exception as e:
-        print(f"[cron][ERROR] Failed to fetch games: {e}")
+        print(f"[cron][ERROR] Elo update failed: {e}")
         sys.exit(1)
 
-    if not games:
-        print(f"[cron] No games found for {d.isoformat()}")
-        return
-
+    today = date.today()
     try:
-        result = update_elo_from_games(games)
-        print(f"[cron] Elo update complete: {result}")
+        slate, _ = build_daily_picks(today)
+        print(f"[cron] Built {len(slate)} scored games for {today.isoformat()}")
     except Exception as e:
-        print(f"[cron][ERROR] Elo update failed: {e}")
+        print(f"[cron][ERROR] Building picks failed: {e}")
         sys.exit(1)
 
+    db = SessionLocal()
+    try:
+        deleted = purge_cache(db)
+        db.commit()
+        print(f"[cron] Purged {deleted} expired or archived cache entries")
+    except Exception as e:
+        # not fatal: the next run will retry
+        print(f"[cron][WARN] Cache purge failed: {e}")
+    finally:
+        db.close()
+
 
 if __name__ == "__main__":
     main()
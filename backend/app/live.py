@@ -0,0 +1,242 @@
+"""
+Live scores and in-game win probabilities, pushed to WebSocket subscribers.
+
+One poller task per process refreshes today's scoreboard every
+LIVE_POLL_SECONDS (through get_scoreboard_async, so the fresh copy also
+serves everyone else), diffs it against the previous poll and fans out only
+the games that changed. It runs while at least one client is subscribed, so
+a single upstream poll serves any number of clients.
+
+Messages (JSON):
+    {"type": "snapshot", "day": ..., "games": [game, ...]}   on connect / day change / resync
+    {"type": "delta", "day": ..., "games": [game, ...], "removed": [key, ...]}
+
+Each game carries the pregame home win probability (Elo, looked up once per
+game) and the live one from elo.live_win_prob.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from datetime import date
+
+from .aio import get_scoreboard_async
+from .elo import GAME_SECONDS, live_win_prob, pick_winner_batch
+from .metrics import inc, span
+from .ncaa import extract_live_games
+from .ratings_store import RATINGS
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "10"))
+# messages buffered per subscriber; a client that falls further behind is
+# sent a fresh snapshot instead of the backlog
+QUEUE_SIZE = 32
+
+HALF_SECONDS = GAME_SECONDS // 2
+_PERIOD_NUMBER = re.compile(r"(\d+)")
+
+
+def _clock_seconds(clock: str) -> float:
+    clock = (clock or "").strip()
+    try:
+        if ":" in clock:
+            minutes, seconds = clock.split(":", 1)
+            return int(minutes) * 60 + float(seconds)
+        return float(clock) if clock else 0.0
+    except ValueError:
+        return 0.0
+
+
+def seconds_left(status: str, period: str, clock: str) -> float | None:
+    """
+    Regulation (or overtime) seconds remaining; None if the period can't be read.
+    """
+    status = (status or "").lower()
+    if status in ("pre", "scheduled", "pregame", "upcoming"):
+        return float(GAME_SECONDS)
+    if status == "final":
+        return 0.0
+
+    p = (period or "").upper()
+    if not p:
+        return None
+    if "FINAL" in p:
+        return 0.0
+    if "HALF" in p:
+        return float(HALF_SECONDS)
+    if "OT" in p:
+        return 0.0 if "END" in p else _clock_seconds(clock)
+    m = _PERIOD_NUMBER.search(p)
+    if m is None:
+        return None
+    n = int(m.group(1))
+    if "END" in p:
+        return float(HALF_SECONDS) if n == 1 else 0.0
+    return (HALF_SECONDS if n == 1 else 0) + _clock_seconds(clock)
+
+
+def _score(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def game_key(g: dict) -> str:
+    return g.get("game_id") or f"{g['home_id']}|{g['away_id']}"
+
+
+def _pregame_probs(games: list[dict]) -> list[float]:
+    """
+    Pregame home win probability for each game from the ratings store
+    (unseen teams count as 1500).
+    """
+    current = RATINGS.get()
+    sides, probs, _ = pick_winner_batch(
+        current.lookup([g["home_id"] for g in games]),
+        current.lookup([g["away_id"] for g in games]),
+        [bool(g.get("neutral")) for g in games],
+    )
+    return [p if side == "HOME" else 1 - p for side, p in zip(sides.tolist(), probs.tolist())]
+
+
+def _live_game(g: dict, p_pregame: float) -> dict:
+    home_score, away_score = _score(g["home_score"]), _score(g["away_score"])
+    left = seconds_left(g["status"], g["period"], g["clock"])
+    if left is None or home_score is None or away_score is None:
+        p_home = p_pregame
+    else:
+        p_home = live_win_prob(p_pregame, home_score - away_score, left)
+    return {
+        "key": game_key(g),
+        "home": g["home_name"],
+        "away": g["away_name"],
+        "home_id": g["home_id"],
+        "away_id": g["away_id"],
+        "status": g["status"],
+        "period": g["period"],
+        "clock": g["clock"],
+        "home_score": home_score,
+        "away_score": away_score,
+        "seconds_left": left,
+        "pregame_home_prob": round(p_pregame, 4),
+        "home_win_prob": round(p_home, 4),
+    }
+
+
+class LiveHub:
+    """
+    Subscribers and the shared poller. All methods run on the event loop.
+    """
+
+    def __init__(self, poll_seconds: float = POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.day: date | None = None
+        self.games: dict[str, dict] = {}
+        self._state: dict[str, tuple] = {}
+        self._pregame: dict[str, float] = {}
+        self._subscribers: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def snapshot(self) -> dict:
+        return {
+            "type": "snapshot",
+            "day": self.day.isoformat() if self.day else None,
+            "games": list(self.games.values()),
+        }
+
+    async def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self.day is not None:
+            q.put_nowait(self.snapshot())
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        self._subscribers.discard(q)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _publish(self, message: dict):
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(message)
+            except asyncio.QueueFull:
+                # slow client: drop its backlog, resync from the current state
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(self.snapshot())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("live poll failed")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def poll(self, d: date | None = None):
+        """
+        Fetch the scoreboard once and publish what changed since the last poll.
+        """
+        d = d or date.today()
+        inc("live_polls_total")
+        sb = await get_scoreboard_async(d, cache_seconds=max(1, int(self.poll_seconds)))
+
+        new_day = d != self.day
+        prev = {} if new_day else self._state
+        pregame = {} if new_day else self._pregame
+
+        with span("live.diff"):
+            state, changed = {}, []
+            for g in extract_live_games(sb):
+                key = game_key(g)
+                state[key] = (g["status"], g["period"], g["clock"], g["home_score"], g["away_score"])
+                if prev.get(key) != state[key]:
+                    changed.append(g)
+            removed = [key for key in prev if key not in state]
+
+        unpriced = [g for g in changed if game_key(g) not in pregame]
+        if unpriced:
+            probs = await asyncio.to_thread(_pregame_probs, unpriced)
+            pregame = {**pregame, **dict(zip((game_key(g) for g in unpriced), probs))}
+
+        # nothing above touched the hub's state, so subscribers joining during
+        # the awaits got a consistent snapshot; switch over in one step
+        with span("live.diff"):
+            games = {} if new_day else self.games
+            for key in removed:
+                games.pop(key, None)
+                pregame.pop(key, None)
+            updates = []
+            for g in changed:
+                game = _live_game(g, pregame[game_key(g)])
+                games[game["key"]] = game
+                updates.append(game)
+            self.day, self.games, self._state, self._pregame = d, games, state, pregame
+
+        if new_day:
+            self._publish(self.snapshot())
+        elif updates or removed:
+            inc("live_game_updates_total", len(updates))
+            self._publish({"type": "delta", "day": d.isoformat(), "games": updates, "removed": removed})
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+LIVE = LiveHub()
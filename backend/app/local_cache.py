@@ -0,0 +1,164 @@
+"""
+In-process L1 cache in front of the shared `cache` table (L2).
+
+Holds already-parsed objects keyed like the cache table, with per-lookup TTLs
+(an entry remembers when its payload was produced, so an L2 row that is already
+4 minutes old only lives 1 more minute in L1), LRU eviction past `maxsize`
+entries, and single-flight loading: concurrent misses for the same key wait for
+one loader call instead of each hitting the DB / upstream.
+
+Values are shared between callers and must be treated as read-only.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+class LocalCache:
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = max(1, int(maxsize))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()  # key -> (value, created_at)
+        self._flights: dict[str, _Flight] = {}
+        self._aflights: dict[str, asyncio.Future] = {}
+        self._stats = dict.fromkeys(("hits", "misses", "stale", "coalesced", "loads", "load_errors", "evictions"), 0)
+
+    _MISS = object()
+
+    def _lookup(self, key: str, ttl_seconds: float) -> Any:
+        # caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if time.time() - created_at <= ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            self._stats["stale"] += 1
+        else:
+            self._stats["misses"] += 1
+        return self._MISS
+
+    def _store(self, key: str, value: Any, created_at: float):
+        # caller holds self._lock
+        self._stats["loads"] += 1
+        self._entries[key] = (value, float(created_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get_or_load(self, key: str, ttl_seconds: float, loader: Callable[[], tuple[Any, float]]) -> Any:
+        """
+        Return the cached value for `key` if it is at most `ttl_seconds` old,
+        otherwise call `loader()` -> (value, created_at unix ts) once and cache it.
+        """
+        with self._lock:
+            value = self._lookup(key, ttl_seconds)
+            if value is not self._MISS:
+                return value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value, created_at = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["load_errors"] += 1
+                del self._flights[key]
+            flight.done.set()
+            raise
+
+        flight.value = value
+        with self._lock:
+            self._store(key, value, created_at)
+            del self._flights[key]
+        flight.done.set()
+        return value
+
+    async def aget_or_load(self, key: str, ttl_seconds: float, loader: Callable[[], Awaitable[tuple[Any, float]]]) -> Any:
+        """
+        Async get_or_load for coroutine loaders; concurrent misses on the same
+        event loop await a single loader call. If the loading task is
+        cancelled, its waiters are not: they retry, one of them loading.
+        """
+        while True:
+            with self._lock:
+                value = self._lookup(key, ttl_seconds)
+                if value is not self._MISS:
+                    return value
+
+                fut = self._aflights.get(key)
+                leader = fut is None
+                if leader:
+                    fut = self._aflights[key] = asyncio.get_running_loop().create_future()
+                else:
+                    self._stats["coalesced"] += 1
+
+            if leader:
+                break
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled() or asyncio.current_task().cancelling():
+                    raise  # this caller was cancelled
+                # the leader was cancelled: retry
+
+        try:
+            value, created_at = await loader()
+        except BaseException as e:
+            with self._lock:
+                self._stats["load_errors"] += 1
+                del self._aflights[key]
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()  # waiters retry
+            else:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved; waiters (if any) still get it
+            raise
+
+        with self._lock:
+            self._store(key, value, created_at)
+            del self._aflights[key]
+        fut.set_result(value)
+        return value
+
+    def invalidate(self, key: str | None = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+LOCAL_CACHE = LocalCache(maxsize=int(os.getenv("LOCAL_CACHE_SIZE", "512")))
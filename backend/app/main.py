@@ -1,17 +1,31 @@
+import asyncio
+import hashlib
+import json
 import os
-from datetime import date
-from fastapi import FastAPI
+import time
+from datetime import date, timedelta
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 
-from .db import init_db, SessionLocal
+from .db import init_db, SessionLocal, dispose_async_engine
+from .aio import close_http_client
 from .ncaa import get_scoreboard, extract_games
-from .elo import pick_winner
-from .elo_update import update_elo_from_games, rebuild_elo_range
-from .repo import get_or_create_team
-from .odds import (
-    fetch_ncaab_moneylines_cached,
-    build_best_price_map,
-    american_to_implied_prob,
+from .repo import get_teams_by_ids, team_rating_history, ratings_as_of, get_job, list_jobs
+from .bracket import simulate_bracket
+from .live import LIVE
+from .matchups import SITES, UnknownTeam, get_matchups
+from .ratings_store import RATINGS
+from .local_cache import LOCAL_CACHE
+from . import archive, job_queue, metrics
+from .upstream import breaker_states
+from .picks import (
+    CONFIDENCE_LEVELS,
+    filter_picks,
+    get_daily_picks_async,
+    get_daily_picks_range_async,
 )
 
 
@@ -29,112 +43,365 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+SERVER_TIMING = os.getenv("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    spans, token = metrics.start_request()
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request(token)
+    elapsed = time.perf_counter() - t0
+
+    # route template, not the raw path, to keep label cardinality bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.observe("http_request_seconds", elapsed, method=request.method, route=route)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(spans, elapsed)
+    return response
+
 @app.on_event("startup")
 def startup():
     init_db()
 
-def is_upcoming_game(g: dict) -> bool:
-    """
-    Based on your sample: status can be 'final'.
-    We'll allow only pregame-ish statuses.
-    """
-    s = (g.get("status") or "").strip().lower()
-    return s in ("pre", "scheduled", "pregame", "upcoming")
-
-def confidence_label(prob: float) -> str:
-    if prob >= 0.85:
-        return "LOCK"
-    if prob >= 0.75:
-        return "STRONG"
-    if prob >= 0.65:
-        return "LEAN"
-    return "PASS"
+@app.on_event("shutdown")
+async def shutdown():
+    job_queue.shutdown()
+    await LIVE.stop()
+    await close_http_client()
+    await dispose_async_engine()
 
 @app.get("/api/picks")
-def picks(day: str | None = None):
+async def picks(
+    day: str | None = None,
+    limit: int = 5,
+    min_confidence: str = "LEAN",
+    if_none_match: str | None = Header(default=None),
+):
     d = date.fromisoformat(day) if day else date.today()
+    min_confidence = min_confidence.upper()
+    if min_confidence not in CONFIDENCE_LEVELS:
+        raise HTTPException(status_code=400, detail=f"min_confidence must be one of {', '.join(CONFIDENCE_LEVELS)}")
 
-    sb = get_scoreboard(d)
-    games = extract_games(sb)
-    games = [g for g in games if is_upcoming_game(g)]
-    # Pull vegas odds once per request (you can cache later)
-    odds_map = {}
+    slate, slate_etag = await get_daily_picks_async(d)
+
+    etag = f'"{slate_etag}.{limit}.{min_confidence}"'
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(filter_picks(slate, limit, min_confidence), headers={"ETag": etag})
+
+MAX_RANGE_DAYS = 31
+
+@app.get("/api/picks/range")
+async def picks_range(
+    start: str,
+    end: str | None = None,
+    limit: int = 5,
+    min_confidence: str = "LEAN",
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    /api/picks for every day in [start, end] (default: a week), streamed as
+    NDJSON: one {"day", "etag", "picks"} line per day, in date order.
+    """
+    start_d = date.fromisoformat(start)
+    end_d = date.fromisoformat(end) if end else start_d + timedelta(days=6)
+    n_days = (end_d - start_d).days + 1
+    if not 1 <= n_days <= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"range must cover 1 to {MAX_RANGE_DAYS} days")
+    min_confidence = min_confidence.upper()
+    if min_confidence not in CONFIDENCE_LEVELS:
+        raise HTTPException(status_code=400, detail=f"min_confidence must be one of {', '.join(CONFIDENCE_LEVELS)}")
+
+    days = [start_d + timedelta(days=i) for i in range(n_days)]
+    built = await get_daily_picks_range_async(days)
+
+    digest = hashlib.sha1(".".join(etag for _, _, etag in built).encode()).hexdigest()[:16]
+    etag = f'"{digest}.{limit}.{min_confidence}"'
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    def lines():
+        for d, slate, day_etag in built:
+            picks = filter_picks(slate, limit, min_confidence)
+            yield json.dumps({"day": d.isoformat(), "etag": day_etag, "picks": picks}, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"ETag": etag})
+
+def _parse_day(value: str, name: str) -> date:
     try:
-        events = fetch_ncaab_moneylines_cached(ttl_seconds=300)  # 5 min cache
-        odds_map = build_best_price_map(events)
-    except Exception:
-        odds_map = {}
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
 
+def _submit_job(kind: str, params: dict):
+    try:
+        return JSONResponse(job_queue.submit(kind, params), status_code=202)
+    except job_queue.JobConflict as e:
+        return JSONResponse({"detail": str(e), "job_id": e.job_id}, status_code=409)
+
+@app.websocket("/ws/live")
+async def live_scores(ws: WebSocket):
+    """
+    Live scores and win probabilities: a snapshot, then deltas as games change.
+    """
+    await ws.accept()
+    q = await LIVE.subscribe()
+
+    async def sender():
+        while True:
+            await ws.send_text(json.dumps(await q.get(), separators=(",", ":")))
+
+    send = asyncio.create_task(sender())
+    try:
+        # clients don't send anything; this returns when they disconnect
+        while True:
+            await ws.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        send.cancel()
+        LIVE.unsubscribe(q)
+
+@app.post("/api/admin/update-elo")
+def admin_update_elo(day: str):
+    d = _parse_day(day, "day")
+    return _submit_job("update", {"day": d.isoformat()})
+
+@app.post("/api/admin/rebuild-elo")
+def admin_rebuild_elo(start: str, end: str, workers: int = 4, sleep_seconds: float = 0.15, source: str = "network"):
+    start_d = _parse_day(start, "start")
+    end_d = _parse_day(end, "end")
+    if end_d < start_d:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if source not in ("network", "archive"):
+        raise HTTPException(status_code=400, detail="source must be 'network' or 'archive'")
+    return _submit_job("rebuild", {
+        "start": start_d.isoformat(),
+        "end": end_d.isoformat(),
+        "workers": workers,
+        "sleep_seconds": sleep_seconds,
+        "source": source,
+    })
+
+@app.post("/api/admin/catch-up-elo")
+def admin_catch_up_elo(until: str | None = None, start: str | None = None):
+    params = {}
+    if until:
+        params["until"] = _parse_day(until, "until").isoformat()
+    if start:
+        params["start"] = _parse_day(start, "start").isoformat()
+    return _submit_job("catch_up", params)
+
+@app.get("/api/admin/jobs")
+def admin_jobs(limit: int = 20):
+    db = SessionLocal()
+    try:
+        return [job_queue.job_status(j) for j in list_jobs(db, limit=max(1, min(limit, 200)))]
+    finally:
+        db.close()
+
+@app.get("/api/admin/jobs/{job_id}")
+def admin_job(job_id: str):
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return job_queue.job_status(job)
+    finally:
+        db.close()
 
+@app.post("/api/admin/jobs/{job_id}/cancel")
+def admin_cancel_job(job_id: str):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"id": job_id, "status": status}
 
+@app.post("/api/admin/purge-cache")
+def admin_purge_cache(grace_seconds: int = 7 * 86400):
     db = SessionLocal()
     try:
-        out = []
-        for g in games:
-            home_team = get_or_create_team(db, g["home_id"], g["home_name"])
-            away_team = get_or_create_team(db, g["away_id"], g["away_name"])
-
-            home_adv = 0.0 if g.get("neutral") else 50.0
-            side, prob = pick_winner(home_team.elo, away_team.elo, home_adv=home_adv)
-            match_key = (g["home_name"].lower(), g["away_name"].lower())
-            vegas = odds_map.get(match_key)
-
-            vegas_home_prob = vegas_away_prob = None
-            home_odds = away_odds = book = None
-
-            if vegas:
-                home_odds = vegas["home_odds"]
-                away_odds = vegas["away_odds"]
-                book = vegas.get("book")
-                vegas_home_prob = round(american_to_implied_prob(home_odds), 4)
-                vegas_away_prob = round(american_to_implied_prob(away_odds), 4)
-
-            pick_team = g["home_name"] if side == "HOME" else g["away_name"]
-
-            conf = confidence_label(float(prob))
-            if conf == "PASS":
-                continue
-
-            out.append({
-                "date": d.isoformat(),
-                "home": g["home_name"],
-                "away": g["away_name"],
-                "pick": pick_team,
-                "win_prob": round(float(prob), 4),
-                "confidence": conf,
-                "status": g.get("status"),
-                "neutral": bool(g.get("neutral")),
-                "home_odds": home_odds,
-                "away_odds": away_odds,
-                "vegas_home_prob": vegas_home_prob,
-                "vegas_away_prob": vegas_away_prob,
-                "book": book,
-                "edge": round(float(prob) - (vegas_home_prob if side == "HOME" else vegas_away_prob or 0.0), 4) if vegas else None,
-            })
-
-        # Commit any “new team inserted” changes
+        deleted = archive.purge_cache(db, grace_seconds=grace_seconds)
         db.commit()
+        return {"deleted": deleted}
+    finally:
+        db.close()
 
-        out.sort(key=lambda x: x["win_prob"], reverse=True)
-        return out[:5]
+@app.get("/api/teams/{team_id}/history")
+def team_history(team_id: str, start: str | None = None, end: str | None = None):
+    db = SessionLocal()
+    try:
+        team = get_teams_by_ids(db, [team_id]).get(team_id)
+        if team is None:
+            raise HTTPException(status_code=404, detail="Unknown team")
+        rows = team_rating_history(db, team_id, start, end)
+        return {
+            "team_id": team.id,
+            "name": team.name,
+            "elo": round(team.elo, 1),
+            "history": [{"day": r.day, "elo": round(r.elo, 1), "games": r.games} for r in rows],
+        }
     finally:
         db.close()
 
-@app.post("/api/admin/update-elo")
-def admin_update_elo(day: str):
-    d = date.fromisoformat(day)
-    sb = get_scoreboard(d)
-    games = extract_games(sb)
-    if not games:
-        return {"games_updated": 0, "note": "No games found."}
+@app.get("/api/ratings")
+def ratings(as_of: str | None = None):
+    """
+    Current ratings, or every team's rating going into `as_of` (YYYY-MM-DD).
+    """
+    current = RATINGS.get()
+    elos = current.as_dict()
+    if as_of:
+        date.fromisoformat(as_of)
+        db = SessionLocal()
+        try:
+            past = ratings_as_of(db, as_of)
+        finally:
+            db.close()
+        if past is None:
+            raise HTTPException(status_code=404, detail="No rating history before that day")
+        elos = {team_id: past.get(team_id, 1500.0) for team_id in elos}
 
-    return update_elo_from_games(games)
+    out = [{"team_id": t, "name": current.name(t), "elo": round(e, 1)} for t, e in elos.items()]
+    out.sort(key=lambda x: x["elo"], reverse=True)
+    return out
 
-@app.post("/api/admin/rebuild-elo")
-def admin_rebuild_elo(start: str, end: str):
-    start_d = date.fromisoformat(start)
-    end_d = date.fromisoformat(end)
-    return rebuild_elo_range(start_d, end_d)
+def _matchup_args(site: str, teams: str | None = None):
+    if site not in SITES:
+        raise HTTPException(status_code=400, detail=f"site must be one of {', '.join(SITES)}")
+    return [t for t in teams.split(",") if t] if teams else None
+
+def _team_info(m, team_id: str) -> dict:
+    return {"team_id": team_id, "name": m.ratings.name(team_id), "elo": round(m.ratings.get(team_id), 1)}
+
+@app.get("/api/matchups")
+def matchup(team: str, opponent: str, site: str = "neutral"):
+    """
+    Chance `team` beats `opponent`, with `team` at home, away or on a neutral floor.
+    """
+    _matchup_args(site)
+    m = get_matchups()
+    try:
+        p = m.cell(team, opponent, site)
+    except UnknownTeam as e:
+        raise HTTPException(status_code=404, detail=f"Unknown team {e.args[0]}")
+    return {
+        "ratings_version": m.version,
+        "site": site,
+        "team": _team_info(m, team),
+        "opponent": _team_info(m, opponent),
+        "win_prob": round(p, 4),
+    }
+
+@app.get("/api/matchups/matrix")
+def matchup_matrix(teams: str | None = None, limit: int = 25, site: str = "neutral"):
+    """
+    Win-probability matrix for `teams` (comma-separated ids), or the top
+    `limit` teams by rating; [i][j] is the chance team i beats team j.
+    """
+    ids = _matchup_args(site, teams)
+    m = get_matchups()
+    ids = ids or m.top_teams(limit)
+    try:
+        block = m.block(ids, site=site)
+    except UnknownTeam as e:
+        raise HTTPException(status_code=404, detail=f"Unknown team {e.args[0]}")
+    return {
+        "ratings_version": m.version,
+        "site": site,
+        "teams": [_team_info(m, t) for t in ids],
+        "matrix": np.round(block, 4).tolist(),
+    }
+
+@app.get("/api/matchups/upsets")
+def matchup_upsets(teams: str | None = None, limit: int = 25, per_team: int = 5, site: str = "neutral"):
+    """
+    Each team's most likely losses to lower-rated opponents, for `teams`
+    (comma-separated ids) or the top `limit` teams by rating.
+    """
+    ids = _matchup_args(site, teams)
+    m = get_matchups()
+    ids = ids or m.top_teams(limit)
+    try:
+        upsets = m.upset_losses(ids, per_team=per_team, site=site)
+    except UnknownTeam as e:
+        raise HTTPException(status_code=404, detail=f"Unknown team {e.args[0]}")
+    return {
+        "ratings_version": m.version,
+        "site": site,
+        "teams": [{**_team_info(m, t), "upset_losses": upsets[t]} for t in ids],
+    }
+
+@app.get("/api/matchups/{team_id}")
+def matchup_row(team_id: str, site: str = "neutral", limit: int | None = None, per_team: int = 5):
+    """
+    One team against every other, most likely wins first, plus its most
+    likely upset losses.
+    """
+    _matchup_args(site)
+    m = get_matchups()
+    try:
+        row = m.row(team_id, site)
+        upsets = m.upset_losses([team_id], per_team=per_team, site=site)[team_id]
+    except UnknownTeam:
+        raise HTTPException(status_code=404, detail="Unknown team")
+    return {
+        "ratings_version": m.version,
+        "site": site,
+        "team": _team_info(m, team_id),
+        "opponents": row if limit is None else row[:max(0, limit)],
+        "upset_losses": upsets,
+    }
+
+class BracketRequest(BaseModel):
+    # 64 slots in bracket order; a slot is a team id or [id, id] for a First Four game
+    slots: list[str | list[str]]
+    sims: int = 10_000
+    seed: int | None = None
+
+@app.post("/api/simulate/bracket")
+def simulate_bracket_endpoint(req: BracketRequest):
+    ids = [t for s in req.slots for t in ([s] if isinstance(s, str) else s)]
+
+    current = RATINGS.get()
+    ratings = {t: current.get(t) for t in ids if t in current}
+
+    try:
+        probs = simulate_bracket(req.slots, ratings, sims=req.sims, seed=req.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    out = [
+        {"team_id": t, "name": current.name(t), "elo": round(ratings[t], 1), "rounds": p}
+        for t, p in probs.items()
+    ]
+    out.sort(key=lambda x: x["rounds"]["Champion"], reverse=True)
+    return {"sims": req.sims, "seed": req.seed, "teams": out}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    stats = LOCAL_CACHE.stats()
+    local_cache = {
+        "local_cache_events_total": ("counter", "In-process cache events.", [
+            ({"event": k}, v) for k, v in stats.items() if k not in ("size", "maxsize")
+        ]),
+        "local_cache_entries": ("gauge", "In-process cache entries.", [({}, stats["size"])]),
+        "ratings_version": ("gauge", "Version of the in-memory ratings snapshot.", [({}, RATINGS.version or 0)]),
+        "live_subscribers": ("gauge", "Open live-score WebSocket connections.", [({}, LIVE.subscribers)]),
+        "upstream_circuit_open": ("gauge", "1 while an upstream's circuit breaker is open.", [
+            ({"upstream": name}, int(state == "open")) for name, state in breaker_states().items()
+        ]),
+    }
+    return PlainTextResponse(metrics.render(local_cache), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/cache-stats")
+def debug_cache_stats():
+    return LOCAL_CACHE.stats()
 
 @app.get("/api/debug/sample-game")
 def debug_sample_game(day: str):
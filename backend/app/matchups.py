@@ -0,0 +1,134 @@
+"""
+What-if matchups: the full pairwise win-probability matrix over every rated
+team, for home, away and neutral sites.
+
+Each site's N x N matrix is computed in one vectorized pass (elo.win_prob_matrix)
+the first time it is asked for and kept until the ratings store hands out a
+new snapshot, i.e. until an Elo update, catch-up or rebuild commits (see
+ratings_store.py). Rows are indexed like the snapshot (Ratings.ids).
+"""
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+
+from .elo import HOME_ADV, win_prob_matrix
+from .metrics import span
+from .ratings_store import RATINGS, Ratings
+
+# site of the first team in a pair -> rating points added to it
+SITES = {"home": HOME_ADV, "away": -HOME_ADV, "neutral": 0.0}
+
+
+class UnknownTeam(KeyError):
+    pass
+
+
+class MatchupMatrix:
+    """
+    Win probabilities for one ratings snapshot; matrices are built per site
+    on first use and are read-only.
+    """
+
+    def __init__(self, ratings: Ratings):
+        self.ratings = ratings
+        self._matrices: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self.ratings.version
+
+    def matrix(self, site: str = "neutral") -> np.ndarray:
+        m = self._matrices.get(site)
+        if m is None:
+            with self._lock:
+                m = self._matrices.get(site)
+                if m is None:
+                    with span("matchups.matrix"):
+                        m = win_prob_matrix(self.ratings.elo, SITES[site])
+                    m.flags.writeable = False
+                    self._matrices[site] = m
+        return m
+
+    def index_of(self, team_id: str) -> int:
+        i = self.ratings.index.get(team_id)
+        if i is None:
+            raise UnknownTeam(team_id)
+        return i
+
+    def cell(self, team_id: str, opponent_id: str, site: str = "neutral") -> float:
+        return float(self.matrix(site)[self.index_of(team_id), self.index_of(opponent_id)])
+
+    def row(self, team_id: str, site: str = "neutral") -> list[dict]:
+        """
+        The team's chance against every other team, most likely wins first.
+        """
+        i = self.index_of(team_id)
+        p = self.matrix(site)[i]
+        order = [j for j in np.argsort(-p, kind="stable").tolist() if j != i]
+        return [self._entry(j, p[j]) for j in order]
+
+    def block(self, team_ids: list[str], opponent_ids: list[str] | None = None, site: str = "neutral") -> np.ndarray:
+        rows = [self.index_of(t) for t in team_ids]
+        cols = rows if opponent_ids is None else [self.index_of(t) for t in opponent_ids]
+        return self.matrix(site)[np.ix_(rows, cols)]
+
+    def top_teams(self, limit: int) -> list[str]:
+        order = np.argsort(-self.ratings.elo, kind="stable")[:max(0, limit)]
+        return [self.ratings.ids[i] for i in order.tolist()]
+
+    def upset_losses(self, team_ids: list[str], per_team: int = 5, site: str = "neutral") -> dict[str, list[dict]]:
+        """
+        For each team, the lower-rated opponents most likely to beat it, most
+        likely first (upset_prob: the opponent's chance). One masked pass over
+        the teams' rows.
+        """
+        rows = np.array([self.index_of(t) for t in team_ids], dtype=np.intp)
+        elo = self.ratings.elo
+        lose = 1 - self.matrix(site)[rows]
+        # only underdogs count as upsets (which also leaves out the team itself)
+        lose = np.where(elo[None, :] < elo[rows][:, None], lose, -1.0)
+
+        k = max(0, min(per_team, len(elo)))
+        if k == 0:
+            return {t: [] for t in team_ids}
+        top = np.argpartition(-lose, k - 1, axis=1)[:, :k]
+        top_p = np.take_along_axis(lose, top, axis=1)
+        order = np.argsort(-top_p, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_p = np.take_along_axis(top_p, order, axis=1)
+
+        return {
+            t: [self._entry(j, p, "upset_prob") for j, p in zip(js.tolist(), ps.tolist()) if p >= 0]
+            for t, js, ps in zip(team_ids, top, top_p)
+        }
+
+    def _entry(self, j: int, p: float, key: str = "win_prob") -> dict:
+        return {
+            "team_id": self.ratings.ids[j],
+            "name": self.ratings.names[j],
+            "elo": round(float(self.ratings.elo[j]), 1),
+            key: round(float(p), 4),
+        }
+
+
+_current: MatchupMatrix | None = None
+_lock = threading.Lock()
+
+
+def get_matchups() -> MatchupMatrix:
+    """
+    The matrices for the current ratings snapshot; a new snapshot (ratings
+    changed) starts a fresh, empty cache.
+    """
+    global _current
+    ratings = RATINGS.get()
+    current = _current
+    if current is None or current.ratings is not ratings:
+        with _lock:
+            if _current is None or _current.ratings is not ratings:
+                _current = MatchupMatrix(ratings)
+            current = _current
+    return current
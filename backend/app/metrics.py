@@ -0,0 +1,164 @@
+"""
+In-process metrics: timing spans and counters, rendered in the Prometheus
+text format by GET /metrics.
+
+    with span("scoreboard"):          # or @span("repo.load_team_ratings")
+        ...
+    inc("upstream_requests_total", upstream="ncaa", outcome="ok")
+
+Spans feed a histogram labelled by span name. While a request is being served
+its spans are also collected per request so main.py can emit a Server-Timing
+header (enabled with SERVER_TIMING=1). Metrics are per process; with several
+workers each one reports its own.
+"""
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "ncaa_picks_"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, tuple], float] = {}
+_histograms: dict[tuple[str, tuple], list] = {}  # -> [bucket counts..., count, sum]
+_help: dict[str, str] = {
+    "span_seconds": "Time spent inside instrumented code paths.",
+    "http_request_seconds": "HTTP request latency by route.",
+    "upstream_requests_total": "Calls to upstream APIs by outcome.",
+    "cache_lookups_total": "Cache table lookups by result.",
+    "elo_games_applied_total": "Games applied to Elo ratings.",
+    "live_polls_total": "Scoreboard polls by the live-score poller.",
+    "live_game_updates_total": "Changed games pushed to live-score subscribers.",
+    "ratings_reloads_total": "Reloads of the in-memory ratings snapshot.",
+}
+
+# spans of the request currently being served: [(name, seconds)], or None
+_request_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_spans", default=None)
+
+
+def _key(name: str, labels: dict) -> tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels):
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + amount
+
+
+def observe(name: str, seconds: float, **labels):
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += 1
+        h[-1] += seconds
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block (or, as a decorator, a sync function call).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        observe("span_seconds", seconds, span=name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, seconds))
+
+
+def start_request() -> tuple[list, contextvars.Token]:
+    spans: list = []
+    return spans, _request_spans.set(spans)
+
+
+def end_request(token: contextvars.Token):
+    _request_spans.reset(token)
+
+
+def server_timing(spans: list, total_seconds: float) -> str:
+    """
+    Server-Timing header value; repeated spans are summed.
+    """
+    totals: dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    totals["total"] = total_seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _value(v) -> str:
+    # exact: "{:g}" would print 1234567 as 1.23457e+06, which Prometheus reads as a stalled counter
+    v = float(v)
+    if math.isnan(v):
+        return "NaN"
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def render(extra: dict[str, tuple[str, str, list]] | None = None) -> str:
+    """
+    All metrics in the Prometheus text exposition format. `extra` maps a
+    metric name to (type, help, [(labels dict, value)]) for values owned
+    elsewhere, e.g. the local cache counters.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    seen = set()
+
+    def header(name, kind, help_text=None):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {PREFIX}{name} {help_text or _help.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {_value(value)}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        header(name, "histogram")
+        for bound, count in zip(BUCKETS, h):
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+        lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h[-2]}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {h[-2]}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {h[-1]:.6f}")
+
+    for name, (kind, help_text, samples) in (extra or {}).items():
+        header(name, kind, help_text)
+        for labels, value in samples:
+            lines.append(f"{PREFIX}{name}{_labels(tuple(sorted(labels.items())))} {_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, Text
+from sqlalchemy import Boolean, Column, String, Float, Integer, Text, Index, LargeBinary
 from .db import Base
 
 class Team(Base):
@@ -10,10 +10,99 @@ class Team(Base):
 class Cache(Base):
     __tablename__ = "cache"
     key = Column(String, primary_key=True)
-    value = Column(Text, nullable=False)
+    value = Column(Text, nullable=False)           # legacy JSON text; "" when payload is set
     created_at = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=True)   # compressed, see cache_codec.py
+    codec = Column(String, nullable=True)          # payload format/version tag
+    expires_at = Column(Integer, nullable=True)    # unix ts after which the entry is stale
 
 class EloRun(Base):
     __tablename__ = "elo_runs"
     day = Column(String, primary_key=True)         # YYYY-MM-DD
     processed_at = Column(Integer, nullable=False) # unix ts
+
+class DailyPicks(Base):
+    __tablename__ = "daily_picks"
+    day = Column(String, primary_key=True)         # YYYY-MM-DD
+    payload = Column(Text, nullable=False)         # JSON: full scored slate, best first
+    etag = Column(String, nullable=False)
+    built_at = Column(Integer, nullable=False)     # unix ts
+    schedule = Column(String, nullable=True)       # picks.schedule_key of the games it was built from
+    expires_at = Column(Integer, nullable=True)    # unix ts; None: a past day, never rebuilt
+
+class RatingHistory(Base):
+    # one row per team per day it played: its rating after that day's games
+    __tablename__ = "rating_history"
+    team_id = Column(String, primary_key=True)
+    day = Column(String, primary_key=True)         # YYYY-MM-DD
+    elo = Column(Float, nullable=False)
+    games = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (Index("ix_rating_history_day", "day"),)
+
+class RatingSnapshot(Base):
+    # every team's rating at the end of `day`, taken every few days
+    __tablename__ = "rating_snapshots"
+    day = Column(String, primary_key=True)         # YYYY-MM-DD
+    team_id = Column(String, primary_key=True)
+    elo = Column(Float, nullable=False)
+
+class Game(Base):
+    # final games whose result has been applied to the ratings, keyed by the
+    # upstream gameID; a game is applied only by the run that inserts its row
+    __tablename__ = "games"
+    id = Column(String, primary_key=True)
+    day = Column(String, nullable=True)            # YYYY-MM-DD, if known
+    home_id = Column(String, nullable=False)
+    away_id = Column(String, nullable=False)
+    home_score = Column(Integer, nullable=False)
+    away_score = Column(Integer, nullable=False)
+    home_elo = Column(Float, nullable=True)        # ratings going into the game
+    away_elo = Column(Float, nullable=True)
+    home_delta = Column(Float, nullable=True)      # applied to home; away got -home_delta
+    applied_at = Column(Integer, nullable=False)   # unix ts
+
+    __table_args__ = (Index("ix_games_day", "day"),)
+
+class RatingsVersion(Base):
+    # single row (id=1), bumped in the same transaction as every rating write,
+    # so processes holding ratings in memory can tell when to reload
+    __tablename__ = "ratings_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(Integer, nullable=False)   # unix ts
+
+class Job(Base):
+    # background admin jobs (see job_queue.py)
+    __tablename__ = "jobs"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)          # rebuild | catch_up | update
+    status = Column(String, nullable=False)        # queued | running | succeeded | failed | cancelled
+    params = Column(Text, nullable=False)          # JSON
+    exclusive = Column(String, nullable=True, unique=True)  # kind while queued/running, for one-at-a-time kinds
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    days_total = Column(Integer, nullable=True)
+    days_done = Column(Integer, nullable=False, default=0)
+    games_applied = Column(Integer, nullable=False, default=0)
+    result = Column(Text, nullable=True)           # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(Float, nullable=False)     # unix ts
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    heartbeat_at = Column(Float, nullable=True)    # last progress write while running
+    owner = Column(String, nullable=True)          # JobWorker.id of the process that runs it
+
+    __table_args__ = (Index("ix_jobs_created_at", "created_at"),)
+
+class JobWorker(Base):
+    # one row per process that has taken jobs; a job whose owner stopped
+    # heartbeating is failed (see job_queue.py)
+    __tablename__ = "job_workers"
+    id = Column(String, primary_key=True)
+    heartbeat_at = Column(Float, nullable=False)   # unix ts
+
+class Migration(Base):
+    # one-time data migrations already run (see db.init_db)
+    __tablename__ = "migrations"
+    name = Column(String, primary_key=True)
+    applied_at = Column(Integer, nullable=False)   # unix ts
@@ -1,26 +1,97 @@
 import json
+import os
+import threading
 import time
 import requests
-from datetime import date
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator, NamedTuple
 from .team_ids import canonical_team_id
 
+try:
+    import orjson
+except ImportError:  # optional: faster JSON decoding
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional: incremental parsing of file payloads
+    ijson = None
+
 
 from .db import SessionLocal
-from .repo import cache_get, cache_set
+from .local_cache import LOCAL_CACHE
+from .metrics import inc, span
+from .repo import cache_get, cache_set, cache_value
+from .upstream import UpstreamError, client_for
+
+NCAA_API_BASE = os.getenv("NCAA_API_BASE", "https://ncaa-api.henrygd.me").rstrip("/")
+
+
+def _loads(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 def _proxy_url(d: date) -> str:
     yyyy, mm, dd = d.strftime("%Y"), d.strftime("%m"), d.strftime("%d")
-    return f"https://ncaa-api.henrygd.me/scoreboard/basketball-men/d1/{yyyy}/{mm}/{dd}"
+    return f"{NCAA_API_BASE}/scoreboard/basketball-men/d1/{yyyy}/{mm}/{dd}"
 
 
-def get_scoreboard(d: date, cache_seconds: int = 300) -> dict:
+def get_scoreboard(d: date, cache_seconds: int = 300, limiter: "RateLimiter | None" = None) -> dict:
     """
     Fetch NCAA men's D1 basketball scoreboard (JSON).
-    Uses Postgres-backed cache table via repo.py (shared across instances).
-    Returns {"games": []} on 404 or request failure.
+    Served from the in-process cache when fresh, then from the Postgres-backed
+    cache table via repo.py (shared across instances), then upstream.
+    While the upstream is failing a stale cached copy is served if there is
+    one, else {"games": []}; either way marked as a fallback (see
+    is_fallback) unless the copy is a finished day's. Returns {"games": []}
+    on 404. `limiter` (a RateLimiter) paces the upstream request only;
+    cache hits don't wait.
     """
     key = f"scoreboard:{d.isoformat()}"
+    with span("scoreboard"):
+        return LOCAL_CACHE.get_or_load(key, cache_seconds, lambda: _load_scoreboard(d, key, cache_seconds, limiter))
+
+
+# how long a stale entry served during an upstream failure stays in the
+# in-process cache before the upstream is tried again
+STALE_RETRY_SECONDS = 30
+
+# set on a scoreboard served in place of a failed fetch
+FALLBACK_KEY = "_fallback"
+
+
+def is_fallback(scoreboard: dict) -> bool:
+    """
+    True if the upstream fetch failed and `scoreboard` is an empty stand-in or
+    a stale copy that may be incomplete (e.g. taken mid-game). Callers that
+    record a day as done must not trust such a day.
+    """
+    return bool(scoreboard.get(FALLBACK_KEY))
+
+
+def fallback_scoreboard(row) -> dict:
+    """
+    What to serve for a failed fetch, given the day's cache row (or None).
+    A copy stored without a TTL is a finished day's and is served as is.
+    """
+    if row is not None:
+        try:
+            value = cache_value(row)
+        except Exception:
+            value = None
+        if value is not None:
+            inc("cache_lookups_total", kind="scoreboard", result="stale_served")
+            if row.payload is not None and row.expires_at is None:
+                return value
+            return {**value, FALLBACK_KEY: True}
+    return {"games": [], FALLBACK_KEY: True}
+
+
+def _load_scoreboard(d: date, key: str, cache_seconds: int, limiter: "RateLimiter | None" = None) -> tuple[dict, int]:
     now = int(time.time())
 
     db = SessionLocal()
@@ -28,68 +99,212 @@ def get_scoreboard(d: date, cache_seconds: int = 300) -> dict:
         row = cache_get(db, key)
         if row and (now - int(row.created_at) <= cache_seconds):
             try:
-                return json.loads(row.value)
+                value = cache_value(row)
+                inc("cache_lookups_total", kind="scoreboard", result="hit")
+                return value, int(row.created_at)
             except Exception:
                 # corrupted cache entry; fall through to refetch
-                pass
-
-        payload = {"games": []}
+                inc("cache_lookups_total", kind="scoreboard", result="corrupt")
+                row = None
+        else:
+            inc("cache_lookups_total", kind="scoreboard", result="stale" if row else "miss")
 
+        if limiter is not None:
+            limiter.wait()
         try:
-            r = requests.get(_proxy_url(d), timeout=20)
-
+            r = _upstream().get(_proxy_url(d))
             if r.status_code == 404:
                 payload = {"games": []}
-            elif r.ok:
-                payload = r.json()
             else:
                 r.raise_for_status()
+                payload = r.json()
+        except (UpstreamError, requests.RequestException, ValueError):
+            # not cached: a failed fetch must not stick (past days never expire)
+            return fallback_scoreboard(row), now - cache_seconds + STALE_RETRY_SECONDS
 
-        except requests.RequestException:
-            payload = {"games": []}
-
-        cache_set(db, key, json.dumps(payload), created_at=now)
+        ttl = scoreboard_ttl(d, payload, cache_seconds)
+        cache_set(db, key, payload, created_at=now, ttl_seconds=ttl)
         db.commit()
-        return payload
+        return payload, now
     finally:
         db.close()
 
 
+def scoreboard_ttl(d: date, payload: dict, cache_seconds: int) -> int | None:
+    """
+    TTL to cache a fetched scoreboard with. Finals don't change: a day before
+    yesterday, or one whose games are all final, is kept without a TTL for
+    offline replays (and is served as is when the upstream is down).
+    """
+    if d < date.today() - timedelta(days=1):
+        return None
+    statuses = [r.status.lower() for r in _records(payload.get("games", []))]
+    return None if statuses and all(s == "final" for s in statuses) else cache_seconds
+
+
+def _upstream():
+    return client_for(NCAA_API_BASE, "ncaa")
+
+
+class RateLimiter:
+    """
+    Spaces out calls so at most one starts every `min_interval` seconds,
+    no matter how many threads share the limiter.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = max(0.0, float(min_interval))
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.min_interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+def prefetch_scoreboards(
+    days: Iterable[date],
+    workers: int = 4,
+    min_interval: float = 0.15,
+) -> Iterator[tuple[date, dict, float]]:
+    """
+    Fetch scoreboards for `days` on a bounded thread pool and yield
+    (day, scoreboard, fetch_seconds) strictly in the order the days were given.
+    At most `workers * 2` fetches are in flight or buffered at any time, and
+    upstream requests (not cache hits) are started no faster than one per
+    `min_interval` seconds; fetch_seconds includes that wait.
+    """
+    workers = max(1, int(workers))
+    limiter = RateLimiter(min_interval)
+
+    def fetch(d: date) -> tuple[dict, float]:
+        t0 = time.perf_counter()
+        sb = get_scoreboard(d, limiter=limiter)
+        return sb, time.perf_counter() - t0
+
+    it = iter(days)
+    pending: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoreboard") as pool:
+        try:
+            for d in it:
+                pending.append((d, pool.submit(fetch, d)))
+                if len(pending) >= workers * 2:
+                    break
+
+            while pending:
+                d, fut = pending.popleft()
+                sb, seconds = fut.result()
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append((nxt, pool.submit(fetch, nxt)))
+                yield d, sb, seconds
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+
+def _team_name(t: dict) -> str:
+    names = t.get("names", {}) or {}
+    return names.get("short") or names.get("seo") or t.get("name") or "Unknown"
+
+
+def _team_id(t: dict, name: str) -> str:
+    # Prefer stable numeric/id if the API provides one,
+    # otherwise canonicalize the name.
+    if t.get("id"):
+        return str(t["id"])
+    return canonical_team_id(name)
+
+
 def extract_games(scoreboard_json: dict) -> list[dict]:
     """
     Normalize the henrygd scoreboard into:
-    [{home_id, home_name, away_id, away_name, neutral, status, home_score, away_score}, ...]
+    [{home_id, home_name, away_id, away_name, neutral, status, home_score, away_score, game_id}, ...]
     """
-    games = []
+    return [r.as_dict() for r in _records(scoreboard_json.get("games", []))]
+
 
+def extract_live_games(scoreboard_json: dict) -> list[dict]:
+    """
+    extract_games() plus the in-game fields the live feed needs:
+    period ("1st", "2nd", "HALF", "OT", "FINAL", ...) and clock ("12:34").
+    """
     raw_games = scoreboard_json.get("games", [])
+    out = []
+    for wrapper, rec in zip(raw_games, _records(raw_games)):
+        g = wrapper.get("game", wrapper)
+        game = rec.as_dict()
+        game["period"] = g.get("currentPeriod") or ""
+        game["clock"] = g.get("contestClock") or ""
+        out.append(game)
+    return out
+
+
+class GameRecord(NamedTuple):
+    """
+    One normalized game as a plain tuple; same fields and values as an
+    extract_games() dict, without a dict per game.
+    """
+    home_id: str
+    home_name: str
+    away_id: str
+    away_name: str
+    neutral: bool
+    status: str
+    home_score: Any
+    away_score: Any
+    game_id: str | None = None      # upstream gameID
+
+    def as_dict(self) -> dict:
+        return dict(zip(GAME_FIELDS, self))
+
+
+GAME_FIELDS = GameRecord._fields
+
+
+def _records(raw_games: Iterable[dict]) -> Iterator[GameRecord]:
     for wrapper in raw_games:
         g = wrapper.get("game", wrapper)
 
         home = g.get("home", {}) or {}
         away = g.get("away", {}) or {}
+        home_name = _team_name(home)
+        away_name = _team_name(away)
 
-        def team_name(t: dict) -> str:
-            names = t.get("names", {}) or {}
-            return names.get("short") or names.get("seo") or t.get("name") or "Unknown"
-
-        def team_id(t: dict) -> str:
-            # Prefer stable numeric/id if the API provides one,
-            # otherwise canonicalize the name.
-            if t.get("id"):
-                return str(t["id"])
-            return canonical_team_id(team_name(t))
-
-
-        games.append({
-            "home_id": team_id(home),
-            "home_name": team_name(home),
-            "away_id": team_id(away),
-            "away_name": team_name(away),
-            "neutral": bool(g.get("neutralSite")),
-            "status": (g.get("gameState") or g.get("status") or "unknown"),
-            "home_score": home.get("score"),
-            "away_score": away.get("score"),
-        })
-
-    return games
+        yield GameRecord(
+            _team_id(home, home_name),
+            home_name,
+            _team_id(away, away_name),
+            away_name,
+            bool(g.get("neutralSite")),
+            (g.get("gameState") or g.get("status") or "unknown"),
+            home.get("score"),
+            away.get("score"),
+            str(g["gameID"]) if g.get("gameID") else None,
+        )
+
+
+def iter_game_records(source) -> Iterator[GameRecord]:
+    """
+    Stream normalized games from a scoreboard without building per-game dicts.
+    source may be an already-parsed scoreboard dict, raw JSON (bytes/str,
+    decoded with orjson when installed) or a binary file object, whose
+    "games" array is parsed incrementally with ijson when installed.
+    Yields the same games, in the same order, as extract_games().
+    """
+    if isinstance(source, dict):
+        raw_games = source.get("games", [])
+    elif isinstance(source, (bytes, bytearray, memoryview, str)):
+        raw_games = (_loads(source) or {}).get("games", [])
+    elif ijson is not None:
+        raw_games = ijson.items(source, "games.item", use_float=True)
+    else:
+        raw_games = (json.load(source) or {}).get("games", [])
+    return _records(raw_games)
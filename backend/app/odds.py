@@ -1,16 +1,26 @@
 import os
 import requests
-import json
+import threading
 import time
 from .db import SessionLocal
-from .repo import cache_get, cache_set
-from datetime import datetime, timezone
+from .local_cache import LOCAL_CACHE
+from .metrics import inc, span
+from .repo import cache_get, cache_set, cache_value, clear_daily_picks
+from .upstream import UpstreamError, client_for
+from .team_ids import canonical_team_id
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
 
 ODDS_API_KEY = os.getenv("ODDS_API_KEY", "")
+ODDS_API_BASE = os.getenv("ODDS_API_BASE", "https://api.the-odds-api.com").rstrip("/")
 
 # The Odds API uses sport key "basketball_ncaab" in v4
 SPORT_KEY = "basketball_ncaab"
 
+# events are matched to the scoreboard day they tip off on in this zone (late
+# West Coast games start after midnight UTC and Eastern time)
+ODDS_DAY_TZ = ZoneInfo(os.getenv("ODDS_DAY_TZ", "America/Los_Angeles"))
+
 def american_to_implied_prob(odds: int) -> float:
     """
     Convert American odds to implied probability (no vig removal).
@@ -30,7 +40,7 @@ def fetch_ncaab_moneylines(regions: str = "us", markets: str = "h2h") -> list[di
     if not ODDS_API_KEY:
         raise RuntimeError("ODDS_API_KEY is not set")
 
-    url = f"https://api.the-odds-api.com/v4/sports/{SPORT_KEY}/odds"
+    url = f"{ODDS_API_BASE}/v4/sports/{SPORT_KEY}/odds"
     params = {
         "apiKey": ODDS_API_KEY,
         "regions": regions,        # us bookmakers
@@ -38,72 +48,207 @@ def fetch_ncaab_moneylines(regions: str = "us", markets: str = "h2h") -> list[di
         "oddsFormat": "american",
         "dateFormat": "iso",
     }
-    r = requests.get(url, params=params, timeout=20)
+    r = _upstream().get(url, params=params)
     r.raise_for_status()
     return r.json()
 
+def _upstream():
+    return client_for(ODDS_API_BASE, "odds")
+
+def _best_prices(e: dict, home: str, away: str) -> tuple | None:
+    # one pass over every book's h2h outcomes; "best" for the bettor = higher American number
+    home_l, away_l = home.lower(), away.lower()
+    best_home = best_away = None
+    home_book = away_book = None
+
+    for b in e.get("bookmakers") or ():
+        book = b.get("title") or b.get("key") or "book"
+        for m in b.get("markets") or ():
+            if m.get("key") != "h2h":
+                continue
+            for o in m.get("outcomes") or ():
+                price = o.get("price")
+                if price is None:
+                    continue
+                try:
+                    price = int(price)
+                except Exception:
+                    continue
+
+                name = o.get("name") or ""
+                if name != home and name != away:
+                    # outcome names normally match exactly; normalize only when they don't
+                    name = name.strip().lower()
+                    name = home if name == home_l else away if name == away_l else None
+
+                if name == home:
+                    if best_home is None or price > best_home:
+                        best_home, home_book = price, book
+                elif name == away:
+                    if best_away is None or price > best_away:
+                        best_away, away_book = price, book
+
+    if best_home is None or best_away is None:
+        return None
+    return best_home, home_book, best_away, away_book
+
+
+# words that continue a school's name rather than start its mascot: "kansas"
+# must not match "kansas-state-wildcats", nor "texas" "texas-a-and-m-aggies"
+_SCHOOL_QUALIFIERS = frozenset({
+    "state", "tech", "a", "and", "city", "college", "university", "christian",
+    "baptist", "southern", "northern", "eastern", "western", "central",
+    "international", "atlantic", "gulf", "upstate", "wesleyan", "poly",
+})
+
+
+def _name_prefixes(team_id: str) -> list[str]:
+    # "duke-blue-devils" -> ["duke", "duke-blue", "duke-blue-devils"]; a cut
+    # right before a school qualifier is skipped ("kansas-state-..." has no "kansas")
+    parts = team_id.split("-")
+    return ["-".join(parts[:i]) for i in range(1, len(parts) + 1)
+            if i == len(parts) or parts[i] not in _SCHOOL_QUALIFIERS]
+
+
+def _event_day(commence_time: str | None) -> str | None:
+    # NCAA scoreboard day of an event's tip-off (UTC ISO timestamp)
+    try:
+        t = datetime.fromisoformat((commence_time or "").replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.astimezone(ODDS_DAY_TZ).date().isoformat()
+
+
 def build_best_price_map(events: list[dict]) -> dict:
     """
-    Returns mapping keyed by normalized matchup:
-      key = (home, away) lowercased strings
-      value = {"home_odds": int, "away_odds": int, "book": str, "commence_time": str}
+    Returns mapping keyed by day and canonical matchup:
+      key = (day, home, away): the ISO day of commence_time in ODDS_DAY_TZ and
+            canonical team ids (team_ids.canonical_team_id)
+      value = {"home_odds": int, "home_book": str, "away_odds": int, "away_book": str,
+               "commence_time": str}
     Chooses the best (most favorable) price for each side across books.
+    Events without a readable commence_time are skipped.
+
+    Odds-API names usually carry a mascot ("Duke Blue Devils") that NCAA names
+    don't, so leading-word prefixes of the names are indexed too ("duke",
+    "duke-blue", ...), except where the name goes on with a school qualifier
+    ("kansas" for "kansas-state-wildcats"), and only prefixes that belong to
+    a single team among that day's events. Exact pairs always win.
     """
-    out = {}
+    exact = {}
+    teams: dict[str, set[str]] = {}  # day -> team ids playing
+    matchups = []
 
     for e in events:
         home = (e.get("home_team") or "").strip()
         away = (e.get("away_team") or "").strip()
-        if not home or not away:
+        day = _event_day(e.get("commence_time"))
+        if not home or not away or day is None:
             continue
 
-        key = (home.lower(), away.lower())
-
-        best_home = None
-        best_away = None
-        best_book = None
-
-        for b in e.get("bookmakers", []) or []:
-            book = b.get("title") or b.get("key") or "book"
-            for m in b.get("markets", []) or []:
-                if m.get("key") != "h2h":
-                    continue
-                for o in m.get("outcomes", []) or []:
-                    name = (o.get("name") or "").strip()
-                    price = o.get("price")
-                    if price is None:
-                        continue
-                    try:
-                        price = int(price)
-                    except Exception:
-                        continue
-
-                    if name.lower() == home.lower():
-                        # "best" for the bettor = higher American number (less negative / more positive)
-                        if best_home is None or price > best_home:
-                            best_home = price
-                            best_book = book
-                    elif name.lower() == away.lower():
-                        if best_away is None or price > best_away:
-                            best_away = price
-                            best_book = book
-
-        if best_home is None or best_away is None:
+        prices = _best_prices(e, home, away)
+        if prices is None:
             continue
 
-        out[key] = {
+        best_home, home_book, best_away, away_book = prices
+        value = {
             "home_odds": best_home,
+            "home_book": home_book,
             "away_odds": best_away,
-            "book": best_book,
+            "away_book": away_book,
             "commence_time": e.get("commence_time"),
         }
 
+        home_id, away_id = canonical_team_id(home), canonical_team_id(away)
+        exact[(day, home_id, away_id)] = value
+        teams.setdefault(day, set()).update((home_id, away_id))
+        matchups.append((day, home_id, away_id, value))
+
+    owners: dict[tuple[str, str], set[str]] = {}  # (day, prefix) -> team ids
+    for day, ids in teams.items():
+        for team_id in ids:
+            for p in _name_prefixes(team_id):
+                owners.setdefault((day, p), set()).add(team_id)
+
+    prefixed = {}
+    ambiguous = set()
+    for day, home_id, away_id, value in matchups:
+        home_ps = [p for p in _name_prefixes(home_id) if len(owners[(day, p)]) == 1]
+        away_ps = [p for p in _name_prefixes(away_id) if len(owners[(day, p)]) == 1]
+        for hp in home_ps:
+            for ap in away_ps:
+                key = (day, hp, ap)
+                if key in prefixed and prefixed[key] is not value:
+                    ambiguous.add(key)  # a team listed twice that day
+                prefixed[key] = value
+
+    for key in ambiguous:
+        del prefixed[key]
+    prefixed.update(exact)
+    return prefixed
+
+
+_index_lock = threading.Lock()
+_index_memo: tuple[object, dict] | None = None
+
+
+def odds_index(events: list[dict]) -> dict:
+    """
+    build_best_price_map, computed once per fetched events list: the cached
+    fetch hands back the same list object until it refreshes, so the index is
+    memoized on that object's identity.
+    """
+    global _index_memo
+    with _index_lock:
+        if _index_memo is not None and _index_memo[0] is events:
+            return _index_memo[1]
+    index = build_best_price_map(events)
+    with _index_lock:
+        _index_memo = (events, index)
+    return index
+
+
+def lookup_odds(index: dict, d: date, home_name: str, away_name: str) -> dict | None:
+    """
+    Best prices for an NCAA matchup on day `d`, oriented to the NCAA home/away sides.
+    """
+    day = d.isoformat()
+    home_id, away_id = canonical_team_id(home_name), canonical_team_id(away_name)
+    vegas = index.get((day, home_id, away_id))
+    if vegas is not None:
+        return vegas
+
+    # neutral-site games are sometimes listed the other way round
+    vegas = index.get((day, away_id, home_id))
+    if vegas is None:
+        return None
+    return {
+        "home_odds": vegas["away_odds"],
+        "home_book": vegas["away_book"],
+        "away_odds": vegas["home_odds"],
+        "away_book": vegas["home_book"],
+        "commence_time": vegas["commence_time"],
+    }
+
+
 def fetch_ncaab_moneylines_cached(ttl_seconds: int = 300) -> list[dict]:
     """
     Cached wrapper around fetch_ncaab_moneylines().
-    Stores raw JSON response in Postgres cache table.
+    In-process cache first, then the raw JSON response in the Postgres cache table.
+    While the upstream is failing, a cached copy up to STALE_MAX_SECONDS old
+    is served instead.
     """
     key = "odds:ncaab:h2h:us"
+    with span("odds"):
+        return LOCAL_CACHE.get_or_load(key, ttl_seconds, lambda: _load_moneylines(key, ttl_seconds))
+
+# odds move; past this age a stale copy is worse than none
+STALE_MAX_SECONDS = 6 * 3600
+STALE_RETRY_SECONDS = 30
+
+def _load_moneylines(key: str, ttl_seconds: int) -> tuple[list[dict], int]:
     now = int(time.time())
 
     db = SessionLocal()
@@ -111,17 +256,26 @@ def fetch_ncaab_moneylines_cached(ttl_seconds: int = 300) -> list[dict]:
         row = cache_get(db, key)
         if row and (now - int(row.created_at) <= ttl_seconds):
             try:
-                return json.loads(row.value)
+                value = cache_value(row)
+                inc("cache_lookups_total", kind="odds", result="hit")
+                return value, int(row.created_at)
             except Exception:
                 # bad cache; fall through and refetch
-                pass
+                inc("cache_lookups_total", kind="odds", result="corrupt")
+                row = None
+        else:
+            inc("cache_lookups_total", kind="odds", result="stale" if row else "miss")
 
-        events = fetch_ncaab_moneylines(regions="us", markets="h2h")
-        cache_set(db, key, json.dumps(events), created_at=now)
+        try:
+            events = fetch_ncaab_moneylines(regions="us", markets="h2h")
+        except (UpstreamError, requests.RequestException):
+            if row is None or now - int(row.created_at) > STALE_MAX_SECONDS:
+                raise
+            inc("cache_lookups_total", kind="odds", result="stale_served")
+            return cache_value(row), now - ttl_seconds + STALE_RETRY_SECONDS
+        cache_set(db, key, events, created_at=now, ttl_seconds=ttl_seconds)
+        clear_daily_picks(db)  # fresh odds -> stored picks are stale
         db.commit()
-        return events
+        return events, now
     finally:
         db.close()
-
-
-    return out
@@ -0,0 +1,294 @@
+"""
+Daily picks: scoring a slate and the materialized per-day result.
+
+The full scored slate for a day (every upcoming game, PASS included) is stored
+in the daily_picks table and served from there; it is rebuilt on a miss or by
+the cron job and dropped whenever ratings or odds change.
+
+A stored slate is only served while the day's (cached) scoreboard still lists
+the same upcoming games it was built from (schedule_key): once a game tips
+off, finishes or the schedule changes, it is rebuilt. Slates for today and
+later also expire after PICKS_TTL_SECONDS so odds are refreshed. A slate
+built from a failed scoreboard or odds fetch is served but never stored.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import date
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .aio import get_scoreboard_async, fetch_ncaab_moneylines_cached_async
+from .db import SessionLocal, get_async_sessionmaker
+from .elo import CONFIDENCE_THRESHOLDS, pick_winner_batch
+from .metrics import span
+from .models import DailyPicks
+from .ncaa import get_scoreboard, extract_games, is_fallback
+from .odds import (
+    fetch_ncaab_moneylines_cached,
+    odds_index,
+    lookup_odds,
+    american_to_implied_prob,
+)
+from .ratings_store import RATINGS
+from .repo import get_daily_picks, get_daily_picks_many, set_daily_picks_many, ratings_as_of
+
+# weakest to strongest
+CONFIDENCE_LEVELS = ["PASS"] + [label for label, _ in reversed(CONFIDENCE_THRESHOLDS)]
+
+
+# stored slates for today and later are rebuilt after this long (the
+# scoreboard and odds cache TTL), which also picks up fresh odds
+PICKS_TTL_SECONDS = 300
+
+
+def is_upcoming_game(g: dict) -> bool:
+    """
+    Based on your sample: status can be 'final'.
+    We'll allow only pregame-ish statuses.
+    """
+    s = (g.get("status") or "").strip().lower()
+    return s in ("pre", "scheduled", "pregame", "upcoming")
+
+
+def score_slate(db: Session, d: date, games: list[dict], odds_map: dict) -> list[dict]:
+    """
+    Score upcoming games and attach vegas odds. Returns every game (PASS
+    included), most confident first. Current ratings come from the in-memory
+    store (checked against the ratings version on `db`); unseen teams rate
+    1500. Past days are scored with the ratings teams had going into that day.
+    """
+    return score_days(db, [(d, games)], odds_map)[d]
+
+
+@span("score_slate")
+def score_days(db: Session, slates: list[tuple[date, list[dict]]], odds_map: dict) -> dict[date, list[dict]]:
+    """
+    score_slate for several days at once: one team lookup and one vectorized
+    scoring pass over every game. Returns day -> scored slate.
+    """
+    current = RATINGS.get(db)
+
+    today = date.today()
+    home_elos, away_elos, neutral = [], [], []
+    for d, games in slates:
+        past = ratings_as_of(db, d.isoformat()) if games and d < today else None
+        if past is None:
+            home_elos.append(current.lookup([g["home_id"] for g in games]))
+            away_elos.append(current.lookup([g["away_id"] for g in games]))
+        else:
+            home_elos.append([past.get(g["home_id"], 1500.0) for g in games])
+            away_elos.append([past.get(g["away_id"], 1500.0) for g in games])
+        neutral += [bool(g.get("neutral")) for g in games]
+    home_elos = np.concatenate(home_elos) if home_elos else np.empty(0)
+    away_elos = np.concatenate(away_elos) if away_elos else np.empty(0)
+
+    sides, probs, labels = pick_winner_batch(home_elos, away_elos, neutral)
+    scored = zip(sides.tolist(), probs.tolist(), labels.tolist())
+
+    out = {}
+    for d, games in slates:
+        day = [_pick(d, g, side, prob, conf, odds_map) for g, (side, prob, conf) in zip(games, scored)]
+        day.sort(key=lambda x: x["win_prob"], reverse=True)
+        out[d] = day
+    return out
+
+
+def _pick(d: date, g: dict, side: str, prob: float, conf: str, odds_map: dict) -> dict:
+    vegas = lookup_odds(odds_map, d, g["home_name"], g["away_name"])
+
+    vegas_home_prob = vegas_away_prob = None
+    home_odds = away_odds = book = None
+
+    if vegas:
+        home_odds = vegas["home_odds"]
+        away_odds = vegas["away_odds"]
+        # book offering the best price on the picked side
+        book = vegas["home_book"] if side == "HOME" else vegas["away_book"]
+        vegas_home_prob = round(american_to_implied_prob(home_odds), 4)
+        vegas_away_prob = round(american_to_implied_prob(away_odds), 4)
+
+    pick_team = g["home_name"] if side == "HOME" else g["away_name"]
+
+    return {
+        "date": d.isoformat(),
+        "home": g["home_name"],
+        "away": g["away_name"],
+        "pick": pick_team,
+        "win_prob": round(float(prob), 4),
+        "confidence": conf,
+        "status": g.get("status"),
+        "neutral": bool(g.get("neutral")),
+        "home_odds": home_odds,
+        "away_odds": away_odds,
+        "vegas_home_prob": vegas_home_prob,
+        "vegas_away_prob": vegas_away_prob,
+        "book": book,
+        "edge": round(float(prob) - (vegas_home_prob if side == "HOME" else vegas_away_prob or 0.0), 4) if vegas else None,
+    }
+
+
+def filter_picks(slate: list[dict], limit: int = 5, min_confidence: str = "LEAN") -> list[dict]:
+    floor = CONFIDENCE_LEVELS.index(min_confidence)
+    keep = set(CONFIDENCE_LEVELS[floor:])
+    return [p for p in slate if p["confidence"] in keep][:max(0, limit)]
+
+
+def upcoming_games(scoreboard: dict) -> list[dict]:
+    return [g for g in extract_games(scoreboard) if is_upcoming_game(g)]
+
+
+def schedule_key(games: list[dict]) -> str:
+    """
+    Digest of the upcoming games a slate is built from.
+    """
+    h = hashlib.sha1()
+    for g in games:
+        h.update(f"{g['home_id']}|{g['away_id']}|{g['home_name']}|{g['away_name']}|{g.get('status')}|{bool(g.get('neutral'))}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def _servable(row: DailyPicks | None, schedule: str, fallback: bool, now: int) -> bool:
+    if row is None:
+        return False
+    if fallback:
+        return True  # can't check it against the scoreboard; still the best we have
+    return row.schedule == schedule and (row.expires_at is None or now < row.expires_at)
+
+
+def _encode(slate: list[dict]) -> tuple[str, str]:
+    payload = json.dumps(slate, separators=(",", ":"))
+    return payload, hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _etag(slate: list[dict]) -> str:
+    return _encode(slate)[1]
+
+
+def _store(db: Session, d: date, slate: list[dict], schedule: str) -> str:
+    return _store_many(db, {d: slate}, {d: schedule})[d]
+
+
+def _store_many(db: Session, slates: dict[date, list[dict]], schedules: dict[date, str]) -> dict[date, str]:
+    now = int(time.time())
+    today = date.today()
+    items = []
+    etags = {}
+    for d, slate in slates.items():
+        payload, etags[d] = _encode(slate)
+        expires_at = None if d < today else now + PICKS_TTL_SECONDS
+        items.append((d.isoformat(), payload, etags[d], schedules[d], expires_at))
+    set_daily_picks_many(db, items)
+    return etags
+
+
+def build_daily_picks(d: date) -> tuple[list[dict], str]:
+    """
+    Fetch, score and store the full slate for `d` (sync; used by jobs).
+    Raises if the scoreboard is unavailable; a slate built without odds
+    because the odds fetch failed is returned but not stored.
+    """
+    sb = get_scoreboard(d)
+    if is_fallback(sb):
+        raise RuntimeError(f"scoreboard for {d.isoformat()} is unavailable")
+    games = upcoming_games(sb)
+    try:
+        odds_map, odds_ok = odds_index(fetch_ncaab_moneylines_cached(ttl_seconds=300)), True
+    except Exception:
+        odds_map, odds_ok = {}, False
+
+    db = SessionLocal()
+    try:
+        slate = score_slate(db, d, games, odds_map)
+        if not odds_ok:
+            return slate, _etag(slate)
+        etag = _store(db, d, slate, schedule_key(games))
+        db.commit()
+        return slate, etag
+    finally:
+        db.close()
+
+
+async def _odds_map_async() -> tuple[dict, bool]:
+    # Pull vegas odds once per build (cached for 5 min); (odds, fetched ok)
+    try:
+        events = await fetch_ncaab_moneylines_cached_async(ttl_seconds=300)
+        return odds_index(events), True
+    except Exception:
+        return {}, False
+
+
+async def get_daily_picks_async(d: date) -> tuple[list[dict], str]:
+    """
+    Stored slate for `d` while it matches the day's scoreboard (see module
+    docstring), otherwise score the upcoming games and store the result.
+    """
+    sb = await get_scoreboard_async(d)
+    games = upcoming_games(sb)
+    schedule = schedule_key(games)
+    fallback = is_fallback(sb)
+
+    Session_ = get_async_sessionmaker()
+    async with Session_() as db:
+        row: DailyPicks | None = await db.run_sync(get_daily_picks, d.isoformat())
+    if _servable(row, schedule, fallback, int(time.time())):
+        return json.loads(row.payload), row.etag
+
+    odds_map, odds_ok = await _odds_map_async()
+    async with Session_() as db:
+        slate = await db.run_sync(score_slate, d, games, odds_map)
+        if fallback or not odds_ok:
+            return slate, _etag(slate)
+        etag = await db.run_sync(_store, d, slate, schedule)
+        await db.commit()
+    return slate, etag
+
+
+# upstream fetches in flight at once when building a range of days
+RANGE_FETCH_CONCURRENCY = 8
+
+
+async def get_daily_picks_range_async(days: list[date]) -> list[tuple[date, list[dict], str]]:
+    """
+    get_daily_picks_async for several days: scoreboards are fetched
+    concurrently and stored slates read in one query; the days whose slate
+    is missing or out of date are scored together (score_days) and stored
+    in one transaction. Returns (day, slate, etag) in the order of `days`.
+    """
+    sem = asyncio.Semaphore(RANGE_FETCH_CONCURRENCY)
+
+    async def fetch(d: date) -> dict:
+        async with sem:
+            return await get_scoreboard_async(d)
+
+    sbs = await asyncio.gather(*(fetch(d) for d in days))
+    games = {d: upcoming_games(sb) for d, sb in zip(days, sbs)}
+    schedules = {d: schedule_key(games[d]) for d in days}
+    fallback = {d for d, sb in zip(days, sbs) if is_fallback(sb)}
+
+    Session_ = get_async_sessionmaker()
+    async with Session_() as db:
+        rows = await db.run_sync(get_daily_picks_many, [d.isoformat() for d in days])
+    now = int(time.time())
+    built = {}
+    for d in days:
+        row = rows.get(d.isoformat())
+        if _servable(row, schedules[d], d in fallback, now):
+            built[d] = (json.loads(row.payload), row.etag)
+
+    missing = [d for d in days if d not in built]
+    if missing:
+        odds_map, odds_ok = await _odds_map_async()
+        async with Session_() as db:
+            scored = await db.run_sync(score_days, [(d, games[d]) for d in missing], odds_map)
+            keep = {d: slate for d, slate in scored.items() if odds_ok and d not in fallback}
+            etags = await db.run_sync(_store_many, keep, schedules)
+            await db.commit()
+        for d, slate in scored.items():
+            built[d] = (slate, etags[d] if d in etags else _etag(slate))
+
+    return [(d, *built[d]) for d in days]
@@ -0,0 +1,133 @@
+"""
+Process-wide, read-only copy of the current ratings.
+
+The teams table is a few hundred rows that change about once a day, so read
+paths (picks, bracket simulations, live win probabilities, /api/ratings)
+score from an in-memory snapshot instead of querying it per request: team
+ids in a list, an id -> index map and the ratings in a NumPy array.
+
+Every rating write bumps ratings_version in the same transaction
+(repo.bump_ratings_version). The store compares its version with the table
+at most every RATINGS_CHECK_SECONDS (one primary-key read), or right away
+when the caller passes a session, and reloads when it differs. Writers in
+this process also call RATINGS.invalidate() after committing, so their own
+changes are visible immediately. A reload builds a new snapshot and swaps
+it in with one assignment; readers holding the old one are unaffected.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .metrics import inc, span
+from .repo import get_ratings_version, load_team_ratings
+
+CHECK_SECONDS = float(os.getenv("RATINGS_CHECK_SECONDS", "5"))
+BASE_ELO = 1500.0
+
+
+class Ratings:
+    """
+    Immutable ratings snapshot. Unknown teams rate BASE_ELO.
+    """
+
+    __slots__ = ("version", "ids", "names", "elo", "index")
+
+    def __init__(self, version: int, ratings: dict[str, float], names: dict[str, str]):
+        self.version = version
+        self.ids = list(ratings)
+        self.names = [names[t] for t in self.ids]
+        self.elo = np.fromiter(ratings.values(), dtype=np.float64, count=len(self.ids))
+        self.elo.flags.writeable = False
+        self.index = {t: i for i, t in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, team_id: str) -> bool:
+        return team_id in self.index
+
+    def get(self, team_id: str, default: float = BASE_ELO) -> float:
+        i = self.index.get(team_id)
+        return float(self.elo[i]) if i is not None else default
+
+    def name(self, team_id: str) -> str | None:
+        i = self.index.get(team_id)
+        return self.names[i] if i is not None else None
+
+    def lookup(self, team_ids, default: float = BASE_ELO) -> np.ndarray:
+        """
+        Ratings for a sequence of team ids, as an array.
+        """
+        idx = np.fromiter((self.index.get(t, -1) for t in team_ids), dtype=np.intp)
+        return np.where(idx >= 0, self.elo[idx], default) if len(self.ids) else np.full(idx.shape, default)
+
+    def as_dict(self) -> dict[str, float]:
+        return dict(zip(self.ids, self.elo.tolist()))
+
+
+class RatingsStore:
+    def __init__(self, check_seconds: float = CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._current: Ratings | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session | None = None) -> Ratings:
+        """
+        The current snapshot. With `db`, the version is checked now (on that
+        session) instead of at most every check_seconds.
+        """
+        current = self._current
+        if db is not None:
+            # no lock: on an async session's run_sync the reads below yield to
+            # the event loop, where another request may be doing the same.
+            # Concurrent reloads just build equal snapshots.
+            return self._refresh(db)
+        if current is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return current
+
+        with self._lock:
+            current = self._current
+            if current is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return current  # another thread just checked
+            db = SessionLocal()
+            try:
+                return self._refresh(db)
+            finally:
+                db.close()
+
+    def _refresh(self, db: Session) -> Ratings:
+        # version first: a write landing in between makes the snapshot look
+        # older than it is, so it gets reloaded again, never the reverse
+        version = get_ratings_version(db)
+        seen = current = self._current
+        if current is None or current.version != version:
+            with span("ratings.reload"):
+                ratings, names = load_team_ratings(db)
+                current = Ratings(version, ratings, names)
+            # unless a concurrent reload got in first (it may be newer)
+            if self._current is seen:
+                self._current = current
+            inc("ratings_reloads_total")
+        self._checked_at = time.monotonic()
+        return current
+
+    def invalidate(self):
+        """
+        Check the version on the next get(); call after committing a rating change.
+        """
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> int | None:
+        current = self._current
+        return current.version if current is not None else None
+
+
+RATINGS = RatingsStore()
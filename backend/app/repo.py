@@ -1,8 +1,39 @@
 import time
+from sqlalchemy import and_, func, or_, select, update
 from sqlalchemy.orm import Session
-from .models import Team, Cache, EloRun
+from . import cache_codec
+from .metrics import span
+from .models import Team, Cache, EloRun, DailyPicks, RatingHistory, RatingSnapshot, Game, Job, JobWorker, Migration, RatingsVersion
+
+UPSERT_CHUNK = 500
+
+# databases whose INSERT supports ON CONFLICT; init_db refuses any other
+SUPPORTED_DIALECTS = ("postgresql", "sqlite")
+
+def _insert(db: Session, model):
+    """
+    Dialect-specific INSERT that supports ON CONFLICT (see SUPPORTED_DIALECTS).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"bulk upsert not supported on {dialect}")
+    return insert(model)
+
+def _upsert(db: Session, model, rows: list[dict], index_elements: list[str], update_cols: list[str]):
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        stmt = _insert(db, model).values(rows[i:i + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_cols},
+        )
+        db.execute(stmt)
 
 # ---- Teams ----
+@span("repo.get_or_create_team")
 def get_or_create_team(db: Session, team_id: str, name: str, base_elo: float = 1500.0) -> Team:
     # NOTE: with autoflush=False, db.get won't see pending inserts unless we flush
     t = db.get(Team, team_id)
@@ -16,6 +47,7 @@ def get_or_create_team(db: Session, team_id: str, name: str, base_elo: float = 1
     db.flush()  # <-- critical: makes the pending row visible to subsequent db.get calls
     return t
 
+@span("repo.set_team_elo")
 def set_team_elo(db: Session, team_id: str, elo: float):
     t = db.get(Team, team_id)
     if not t:
@@ -25,26 +57,168 @@ def set_team_elo(db: Session, team_id: str, elo: float):
     else:
         t.elo = float(elo)
 
+@span("repo.reset_all_elos")
 def reset_all_elos(db: Session, base_elo: float = 1500.0) -> int:
     return db.query(Team).update({Team.elo: float(base_elo)})
 
+@span("repo.load_team_ratings")
+def load_team_ratings(db: Session) -> tuple[dict[str, float], dict[str, str]]:
+    """
+    Read every team in one query. Returns (ratings, names), both keyed by team id.
+    """
+    ratings, names = {}, {}
+    for team_id, name, elo in db.execute(select(Team.id, Team.name, Team.elo)):
+        ratings[team_id] = float(elo)
+        names[team_id] = name
+    return ratings, names
+
+@span("repo.get_teams_by_ids")
+def get_teams_by_ids(db: Session, team_ids) -> dict[str, Team]:
+    ids = list(set(team_ids))
+    if not ids:
+        return {}
+    return {t.id: t for t in db.scalars(select(Team).where(Team.id.in_(ids)))}
+
+@span("repo.resolve_teams")
+def resolve_teams(db: Session, teams: dict[str, str], base_elo: float = 1500.0) -> dict[str, Team]:
+    """
+    Bulk get_or_create_team for a whole slate: {team_id: name} -> {team_id: Team}.
+    One SELECT ... WHERE id IN (...) for existing teams, one multi-row insert
+    (ON CONFLICT DO NOTHING) for the missing ones, and one SELECT to load them.
+    """
+    found = get_teams_by_ids(db, teams)
+    for team_id, t in found.items():
+        name = teams[team_id]
+        if name and t.name != name:
+            t.name = name
+
+    missing = [team_id for team_id in teams if team_id not in found]
+    if missing:
+        rows = [{"id": team_id, "name": teams[team_id], "elo": float(base_elo)} for team_id in missing]
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            db.execute(_insert(db, Team).values(rows[i:i + UPSERT_CHUNK]).on_conflict_do_nothing(index_elements=["id"]))
+        found.update(get_teams_by_ids(db, missing))
+
+    return found
+
+@span("repo.remap_team_ids")
+def remap_team_ids(db: Session, remap: dict[str, str]) -> int:
+    """
+    Rename team ids everywhere they are stored ({old: new}). Where a team
+    already has rows under the new id, those are kept and the old ones
+    dropped. Returns the number of teams renamed.
+    """
+    old_ids = [t for t in db.scalars(select(Team.id).where(Team.id.in_(list(remap))))]
+    for old in old_ids:
+        new = remap[old]
+        for model in (RatingHistory, RatingSnapshot):
+            taken = select(model.day).where(model.team_id == new).scalar_subquery()
+            db.execute(update(model).where(model.team_id == old, model.day.not_in(taken)).values(team_id=new))
+            db.query(model).filter(model.team_id == old).delete(synchronize_session=False)
+        db.execute(update(Game).where(Game.home_id == old).values(home_id=new))
+        db.execute(update(Game).where(Game.away_id == old).values(away_id=new))
+        if db.get(Team, new) is not None:
+            db.query(Team).filter(Team.id == old).delete(synchronize_session=False)
+        else:
+            db.execute(update(Team).where(Team.id == old).values(id=new))
+    if old_ids:
+        bump_ratings_version(db)
+    return len(old_ids)
+
+@span("repo.bulk_upsert_teams")
+def bulk_upsert_teams(db: Session, ratings: dict[str, float], names: dict[str, str]):
+    rows = [
+        {"id": team_id, "name": names.get(team_id) or team_id, "elo": float(elo)}
+        for team_id, elo in ratings.items()
+    ]
+    _upsert(db, Team, rows, ["id"], ["name", "elo"])
+
+@span("repo.bump_ratings_version")
+def bump_ratings_version(db: Session):
+    """
+    Mark ratings as changed; call in the transaction that changes them.
+    """
+    now = int(time.time())
+    bump = update(RatingsVersion).where(RatingsVersion.id == 1).values(version=RatingsVersion.version + 1, updated_at=now)
+    if db.execute(bump).rowcount:
+        return
+    stmt = _insert(db, RatingsVersion).values(id=1, version=1, updated_at=now)
+    if db.execute(stmt.on_conflict_do_nothing(index_elements=["id"]).returning(RatingsVersion.id)).first() is None:
+        db.execute(bump)  # created concurrently
+
+@span("repo.get_ratings_version")
+def get_ratings_version(db: Session) -> int:
+    return db.scalar(select(RatingsVersion.version).where(RatingsVersion.id == 1)) or 0
+
 # ---- Cache ----
+@span("repo.cache_get")
 def cache_get(db: Session, key: str):
     return db.get(Cache, key)
 
-def cache_set(db: Session, key: str, value: str, created_at: int | None = None):
+def cache_value(row: Cache):
+    """
+    Decoded payload of a cache row (compressed binary, or legacy JSON text).
+    Raises on a corrupt entry.
+    """
+    if row.payload is not None:
+        return cache_codec.decode(row.payload, row.codec)
+    return cache_codec.json_loads(row.value)
+
+@span("repo.cache_set")
+def cache_set(db: Session, key: str, obj, created_at: int | None = None, ttl_seconds: int | None = None):
     created_at = created_at or int(time.time())
+    payload, codec = cache_codec.encode(obj)
+    expires_at = created_at + ttl_seconds if ttl_seconds is not None else None
     c = db.get(Cache, key)
     if c:
-        c.value = value
+        c.value = ""
+        c.payload = payload
+        c.codec = codec
         c.created_at = created_at
+        c.expires_at = expires_at
     else:
-        db.add(Cache(key=key, value=value, created_at=created_at))
+        db.add(Cache(key=key, value="", payload=payload, codec=codec, created_at=created_at, expires_at=expires_at))
+
+@span("repo.cache_keys_before")
+def cache_keys_before(db: Session, prefix: str, before: str) -> list[tuple[str, int | None]]:
+    """
+    (key, expires_at) of the entries with `prefix` whose key sorts before
+    prefix + before (for dated keys: the days before `before`).
+    """
+    q = select(Cache.key, Cache.expires_at).where(Cache.key.startswith(prefix), Cache.key < prefix + before)
+    return [(k, e) for k, e in db.execute(q.order_by(Cache.key))]
+
+@span("repo.cache_purge_expired")
+def cache_purge_expired(db: Session, grace_seconds: int = 7 * 86400, now: int | None = None,
+                        keep_prefix: str = "scoreboard:", release=()) -> int:
+    """
+    Delete entries that expired more than `grace_seconds` ago (recently stale
+    entries stay around as a fallback). Entries written without a TTL never
+    expire; legacy rows from before expires_at existed are judged by
+    created_at. `keep_prefix` entries are kept (backtests replay from them,
+    and a day's last copy may have been written with a TTL) except the keys
+    in `release`, which are deleted outright.
+    """
+    cutoff = (now or int(time.time())) - grace_seconds
+    q = db.query(Cache).filter(
+        ~Cache.key.startswith(keep_prefix),
+        or_(
+            Cache.expires_at < cutoff,
+            and_(Cache.expires_at.is_(None), Cache.payload.is_(None), Cache.created_at < cutoff),
+        ),
+    )
+    deleted = q.delete(synchronize_session=False)
+    release = list(release)
+    for i in range(0, len(release), UPSERT_CHUNK):
+        deleted += db.query(Cache).filter(Cache.key.in_(release[i:i + UPSERT_CHUNK])).delete(synchronize_session=False)
+    return deleted
 
 # ---- Elo Runs ----
+@span("repo.is_day_processed")
 def is_day_processed(db: Session, day_iso: str) -> bool:
     return db.get(EloRun, day_iso) is not None
 
+@span("repo.mark_day_processed")
 def mark_day_processed(db: Session, day_iso: str):
     r = db.get(EloRun, day_iso)
     ts = int(time.time())
@@ -53,5 +227,299 @@ def mark_day_processed(db: Session, day_iso: str):
     else:
         db.add(EloRun(day=day_iso, processed_at=ts))
 
+@span("repo.bulk_mark_days_processed")
+def bulk_mark_days_processed(db: Session, day_isos: list[str]):
+    ts = int(time.time())
+    rows = [{"day": d, "processed_at": ts} for d in day_isos]
+    _upsert(db, EloRun, rows, ["day"], ["processed_at"])
+
+@span("repo.last_processed_day")
+def last_processed_day(db: Session) -> str | None:
+    return db.scalar(select(func.max(EloRun.day)))
+
+@span("repo.processed_days_between")
+def processed_days_between(db: Session, start_iso: str, end_iso: str) -> set[str]:
+    q = select(EloRun.day).where(EloRun.day >= start_iso, EloRun.day <= end_iso)
+    return set(db.scalars(q))
+
+@span("repo.clear_processed_days")
 def clear_processed_days(db: Session):
     db.query(EloRun).delete()
+
+# ---- Applied games ----
+@span("repo.claim_games")
+def claim_games(db: Session, rows: list[dict]) -> set[str]:
+    """
+    Insert games rows (id, day, home_id, away_id, home_score, away_score) in
+    one statement per chunk, skipping ids already present. Returns the ids
+    this call inserted: the games it now owns and must apply. A concurrent
+    run claiming the same ids waits on this transaction, then gets nothing.
+    """
+    if not rows:
+        return set()
+    ts = int(time.time())
+    claimed = set()
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        chunk = [{**r, "applied_at": ts} for r in rows[i:i + UPSERT_CHUNK]]
+        stmt = _insert(db, Game).values(chunk).on_conflict_do_nothing(index_elements=["id"]).returning(Game.id)
+        claimed.update(db.scalars(stmt))
+    return claimed
+
+@span("repo.set_game_deltas")
+def set_game_deltas(db: Session, rows: list[dict]):
+    """
+    rows: {"id", "home_elo", "away_elo", "home_delta"} for claimed games.
+    """
+    if rows:
+        db.execute(update(Game), rows)
+
+@span("repo.bulk_insert_games")
+def bulk_insert_games(db: Session, rows: list[dict]):
+    ts = int(time.time())
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        db.execute(_insert(db, Game).values([{**r, "applied_at": ts} for r in rows[i:i + UPSERT_CHUNK]]))
+
+@span("repo.clear_games")
+def clear_games(db: Session):
+    db.query(Game).delete()
+
+@span("repo.lock_teams")
+def lock_teams(db: Session, team_ids) -> dict[str, Team]:
+    """
+    Re-read teams with row locks (in id order, so concurrent runs cannot
+    deadlock) and fresh values. SQLite ignores FOR UPDATE; its writers are
+    serialized anyway.
+    """
+    q = (
+        select(Team).where(Team.id.in_(list(team_ids))).order_by(Team.id)
+        .with_for_update().execution_options(populate_existing=True)
+    )
+    return {t.id: t for t in db.scalars(q)}
+
+# ---- Daily picks ----
+@span("repo.get_daily_picks")
+def get_daily_picks(db: Session, day_iso: str):
+    return db.get(DailyPicks, day_iso)
+
+@span("repo.get_daily_picks_many")
+def get_daily_picks_many(db: Session, day_isos: list[str]) -> dict[str, DailyPicks]:
+    return {r.day: r for r in db.scalars(select(DailyPicks).where(DailyPicks.day.in_(day_isos)))}
+
+def set_daily_picks(db: Session, day_iso: str, payload: str, etag: str, schedule: str | None = None,
+                    expires_at: int | None = None):
+    set_daily_picks_many(db, [(day_iso, payload, etag, schedule, expires_at)])
+
+@span("repo.set_daily_picks_many")
+def set_daily_picks_many(db: Session, items: list[tuple[str, str, str, str | None, int | None]]):
+    """
+    Upsert (day, payload, etag, schedule, expires_at) rows in one statement per chunk.
+    """
+    ts = int(time.time())
+    rows = [
+        {"day": d, "payload": payload, "etag": etag, "built_at": ts, "schedule": schedule, "expires_at": expires_at}
+        for d, payload, etag, schedule, expires_at in items
+    ]
+    _upsert(db, DailyPicks, rows, ["day"], ["payload", "etag", "built_at", "schedule", "expires_at"])
+
+@span("repo.clear_daily_picks")
+def clear_daily_picks(db: Session):
+    """
+    Drop every materialized slate; call in the same transaction that changes
+    ratings or odds so stale picks are never served after it commits.
+    """
+    db.query(DailyPicks).delete()
+
+# ---- Rating history ----
+@span("repo.record_rating_history")
+def record_rating_history(db: Session, day_iso: str, ratings: dict[str, float], games: dict[str, int]):
+    """
+    Upsert end-of-day ratings for the teams that played on `day_iso`.
+    games: team id -> number of games it played that day.
+    """
+    rows = [
+        {"team_id": team_id, "day": day_iso, "elo": float(ratings[team_id]), "games": n}
+        for team_id, n in games.items()
+    ]
+    # games accumulate: a day can be applied in several batches as finals come in
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        stmt = _insert(db, RatingHistory).values(rows[i:i + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["team_id", "day"],
+            set_={"elo": stmt.excluded.elo, "games": RatingHistory.games + stmt.excluded.games},
+        )
+        db.execute(stmt)
+
+@span("repo.bulk_insert_rating_history")
+def bulk_insert_rating_history(db: Session, rows: list[dict]):
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        db.execute(_insert(db, RatingHistory).values(rows[i:i + UPSERT_CHUNK]))
+
+@span("repo.save_rating_snapshot")
+def save_rating_snapshot(db: Session, day_iso: str, ratings: dict[str, float]):
+    rows = [{"day": day_iso, "team_id": team_id, "elo": float(elo)} for team_id, elo in ratings.items()]
+    _upsert(db, RatingSnapshot, rows, ["day", "team_id"], ["elo"])
+
+@span("repo.clear_rating_history")
+def clear_rating_history(db: Session):
+    db.query(RatingHistory).delete()
+    db.query(RatingSnapshot).delete()
+
+@span("repo.ratings_as_of")
+def ratings_as_of(db: Session, day_iso: str) -> dict[str, float] | None:
+    """
+    Every team's rating going into `day_iso` (after all earlier days' games).
+    Latest snapshot before the day, then the history rows after it in day
+    order. Teams with no earlier games are absent. Returns None when no
+    history has been recorded before that day at all.
+    """
+    snap_day = db.scalar(select(func.max(RatingSnapshot.day)).where(RatingSnapshot.day < day_iso))
+
+    ratings: dict[str, float] = {}
+    q = select(RatingHistory.team_id, RatingHistory.elo).where(RatingHistory.day < day_iso)
+    if snap_day is not None:
+        snap = select(RatingSnapshot.team_id, RatingSnapshot.elo).where(RatingSnapshot.day == snap_day)
+        ratings.update((team_id, float(elo)) for team_id, elo in db.execute(snap))
+        q = q.where(RatingHistory.day > snap_day)
+
+    rows = db.execute(q.order_by(RatingHistory.day)).all()
+    if snap_day is None and not rows:
+        return None
+    ratings.update((team_id, float(elo)) for team_id, elo in rows)
+    return ratings
+
+@span("repo.team_rating_history")
+def team_rating_history(db: Session, team_id: str, start_iso: str | None = None, end_iso: str | None = None) -> list[RatingHistory]:
+    q = select(RatingHistory).where(RatingHistory.team_id == team_id)
+    if start_iso:
+        q = q.where(RatingHistory.day >= start_iso)
+    if end_iso:
+        q = q.where(RatingHistory.day <= end_iso)
+    return list(db.scalars(q.order_by(RatingHistory.day)))
+
+# ---- Jobs ----
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+@span("repo.create_job")
+def create_job(db: Session, job_id: str, kind: str, params: str, exclusive: str | None = None,
+               owner: str | None = None) -> Job:
+    """
+    Add a queued job. With `exclusive`, raises IntegrityError (on flush)
+    while another queued/running job holds the same key.
+    """
+    job = Job(
+        id=job_id, kind=kind, status="queued", params=params, exclusive=exclusive, owner=owner,
+        cancel_requested=False, days_done=0, games_applied=0, created_at=time.time(),
+    )
+    db.add(job)
+    db.flush()
+    return job
+
+@span("repo.get_job")
+def get_job(db: Session, job_id: str) -> Job | None:
+    return db.get(Job, job_id)
+
+@span("repo.list_jobs")
+def list_jobs(db: Session, limit: int = 20) -> list[Job]:
+    return list(db.scalars(select(Job).order_by(Job.created_at.desc()).limit(limit)))
+
+@span("repo.active_job")
+def active_job(db: Session, exclusive: str) -> Job | None:
+    return db.scalar(select(Job).where(Job.exclusive == exclusive))
+
+@span("repo.start_job")
+def start_job(db: Session, job_id: str) -> bool:
+    """
+    queued -> running; False if the job is no longer queued (e.g. cancelled).
+    """
+    now = time.time()
+    n = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "queued")
+        .values(status="running", started_at=now, heartbeat_at=now)
+    ).rowcount
+    return n == 1
+
+@span("repo.update_job_progress")
+def update_job_progress(db: Session, job_id: str, days_done: int, days_total: int | None, games_applied: int) -> bool:
+    """
+    Record progress and heartbeat; returns whether cancellation was requested.
+    """
+    db.execute(
+        update(Job).where(Job.id == job_id)
+        .values(days_done=days_done, days_total=days_total, games_applied=games_applied, heartbeat_at=time.time())
+    )
+    return bool(db.scalar(select(Job.cancel_requested).where(Job.id == job_id)))
+
+@span("repo.finish_job")
+def finish_job(db: Session, job_id: str, status: str, result: str | None = None, error: str | None = None):
+    db.execute(
+        update(Job).where(Job.id == job_id)
+        .values(status=status, result=result, error=error, exclusive=None, finished_at=time.time())
+    )
+
+@span("repo.request_job_cancel")
+def request_job_cancel(db: Session, job_id: str) -> str | None:
+    """
+    Flag a job for cancellation. A queued job is cancelled on the spot; a
+    running one stops at its next progress report. Returns the job's status
+    afterwards (None if unknown).
+    """
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "queued")
+        .values(status="cancelled", cancel_requested=True, exclusive=None, finished_at=time.time())
+    )
+    db.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(cancel_requested=True))
+    return db.scalar(select(Job.status).where(Job.id == job_id))
+
+@span("repo.cancel_owned_jobs")
+def cancel_owned_jobs(db: Session, owner: str) -> int:
+    """
+    Cancel `owner`'s queued jobs (its queue is going away), releasing their
+    exclusive keys.
+    """
+    return db.execute(
+        update(Job).where(Job.owner == owner, Job.status == "queued")
+        .values(status="cancelled", cancel_requested=True, exclusive=None, finished_at=time.time())
+    ).rowcount
+
+@span("repo.worker_heartbeat")
+def worker_heartbeat(db: Session, worker_id: str):
+    now = time.time()
+    if db.execute(update(JobWorker).where(JobWorker.id == worker_id).values(heartbeat_at=now)).rowcount:
+        return
+    db.execute(_insert(db, JobWorker).values(id=worker_id, heartbeat_at=now).on_conflict_do_nothing(index_elements=["id"]))
+
+@span("repo.fail_stale_jobs")
+def fail_stale_jobs(db: Session, cutoff: float) -> int:
+    """
+    Fail queued and running jobs whose owner has not heartbeated since
+    `cutoff` (the process is gone), and forget such workers. Jobs from
+    before owners were recorded are judged by their own age and heartbeat.
+    """
+    live = select(JobWorker.id).where(JobWorker.heartbeat_at >= cutoff)
+    stale = and_(Job.status.in_(ACTIVE_JOB_STATUSES), or_(
+        and_(Job.owner.is_not(None), Job.owner.not_in(live)),
+        and_(Job.owner.is_(None), or_(
+            and_(Job.status == "running", Job.heartbeat_at < cutoff),
+            and_(Job.status == "queued", Job.created_at < cutoff),
+        )),
+    ))
+    n = db.execute(
+        update(Job).where(stale)
+        .values(status="failed", error="worker lost", exclusive=None, finished_at=time.time())
+    ).rowcount
+    db.query(JobWorker).filter(JobWorker.heartbeat_at < cutoff).delete(synchronize_session=False)
+    return n
+
+# ---- Migrations ----
+@span("repo.migration_applied")
+def migration_applied(db: Session, name: str) -> bool:
+    return db.get(Migration, name) is not None
+
+@span("repo.record_migration")
+def record_migration(db: Session, name: str):
+    stmt = _insert(db, Migration).values(name=name, applied_at=int(time.time()))
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+
+@span("repo.has_applied_games")
+def has_applied_games(db: Session) -> bool:
+    return db.scalar(select(Game.id).limit(1)) is not None
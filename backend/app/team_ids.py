@@ -1,11 +1,17 @@
 import re
 import unicodedata
+from functools import lru_cache
+from typing import Iterable
 
 # optional: hard-coded overrides for known tricky schools
-# key = normalized input (after basic cleanup), value = canonical id you want
+# key = normalized input (after alias expansion, space separated), value = canonical id you want
 OVERRIDES = {
-    "st johns": "st-johns-ny",
+    "saint johns": "st-johns-ny",
+    "saint johns ny": "st-johns-ny",
+    "mount state marys": "mount-saint-marys",
     "miami": "miami-fl",
+    "miami fl": "miami-fl",
+    "ole mississippi": "ole-miss",
     "usc": "southern-california",
     "ucla": "ucla",
     "pitt": "pittsburgh",
@@ -13,34 +19,119 @@ OVERRIDES = {
     "unc": "north-carolina",
 }
 
-_RE_PUNCT = re.compile(r"[^a-z0-9\s-]")
-_RE_WS = re.compile(r"\s+")
+# Whole-token aliases. LEADING_ALIASES apply to the first word of a name
+# ("St. John's" -> saint), TOKEN_ALIASES to every later word ("Michigan St."
+# -> state, "Eastern Ky." -> kentucky). Matching whole tokens keeps e.g. the
+# "st" inside "west" untouched. Only unambiguous abbreviations belong here:
+# "La." and "Mo." are left alone (Louisiana vs Los Angeles, Missouri vs Mo.).
+LEADING_ALIASES = {
+    "&": "and",
+    "st": "saint",
+    "mt": "mount",
+}
+TOKEN_ALIASES = {
+    "&": "and",
+    "st": "state",
+    "mt": "mount",
+    "ala": "alabama",
+    "ariz": "arizona",
+    "ark": "arkansas",
+    "caro": "carolina",
+    "colo": "colorado",
+    "conn": "connecticut",
+    "fla": "florida",
+    "ga": "georgia",
+    "ill": "illinois",
+    "ky": "kentucky",
+    "mich": "michigan",
+    "miss": "mississippi",
+    "so": "southern",
+    "tenn": "tennessee",
+    "val": "valley",
+    "wash": "washington",
+}
+
+_RE_TOKEN = re.compile(r"[a-z0-9]+|&")
+_DROP = str.maketrans("", "", "'.")  # joined, not split: "john's" -> "johns"
 
 def _ascii(s: str) -> str:
+    # NFKD splits accents into combining marks, which the ASCII encode drops
+    if s.isascii():
+        return s
     return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
 
+@lru_cache(maxsize=4096)
 def canonical_team_id(team_name: str) -> str:
     """
     Turn a team name like 'Michigan St.' into a stable id like 'michigan-state'.
+    Memoized: the same few hundred names come through on every scoreboard.
     """
-    s = _ascii(team_name or "").lower().strip()
+    tokens = _RE_TOKEN.findall(_ascii(team_name or "").lower().translate(_DROP))
+    if not tokens:
+        return ""
 
-    # normalize common abbreviations/variants
-    s = s.replace("&", " and ")
-    s = s.replace("st.", "state")
-    s = s.replace("st ", "state ")
-    s = s.replace(" mt.", " mount")
-    s = s.replace(" mt ", " mount ")
-
-    # remove punctuation (keep letters/numbers/spaces/hyphens)
-    s = _RE_PUNCT.sub("", s)
-
-    # collapse whitespace
-    s = _RE_WS.sub(" ", s).strip()
+    tokens[0] = LEADING_ALIASES.get(tokens[0], tokens[0])
+    for i in range(1, len(tokens)):
+        tokens[i] = TOKEN_ALIASES.get(tokens[i], tokens[i])
 
     # apply overrides (after cleanup)
+    s = " ".join(tokens)
     if s in OVERRIDES:
         return OVERRIDES[s]
 
     # slugify spaces -> hyphens
+    return "-".join(tokens)
+
+_LEGACY_OVERRIDES = {
+    "st johns": "st-johns-ny",
+    "miami": "miami-fl",
+    "usc": "southern-california",
+    "ucla": "ucla",
+    "pitt": "pittsburgh",
+    "lsu": "louisiana-state",
+    "unc": "north-carolina",
+}
+_RE_LEGACY_PUNCT = re.compile(r"[^a-z0-9\s-]")
+_RE_LEGACY_WS = re.compile(r"\s+")
+
+def legacy_team_id(team_name: str) -> str:
+    """
+    The id the replace-based canonicalizer gave before the token pass
+    (e.g. "St. Bonaventure" -> "state-bonaventure", "East Carolina" -> "eastate-carolina").
+    Only for migrating ids stored back then; see legacy_id_remap.
+    """
+    s = unicodedata.normalize("NFKD", team_name or "").encode("ascii", "ignore").decode("ascii").lower().strip()
+    s = s.replace("&", " and ")
+    s = s.replace("st.", "state")
+    s = s.replace("st ", "state ")
+    s = s.replace(" mt.", " mount")
+    s = s.replace(" mt ", " mount ")
+    s = _RE_LEGACY_PUNCT.sub("", s)
+    s = _RE_LEGACY_WS.sub(" ", s).strip()
+    if s in _LEGACY_OVERRIDES:
+        return _LEGACY_OVERRIDES[s]
     return s.replace(" ", "-")
+
+def legacy_id_remap(team_names: Iterable[str]) -> dict[str, str]:
+    """
+    {legacy id: current id} for the names whose id changed.
+    """
+    remap = {}
+    for name in set(team_names):
+        old, new = legacy_team_id(name), canonical_team_id(name)
+        if old != new:
+            remap[old] = new
+    return remap
+
+def canonical_team_ids(team_names: Iterable[str]) -> list[str]:
+    """
+    canonical_team_id for a whole slate; repeated names are resolved once.
+    """
+    seen: dict[str, str] = {}
+    out = []
+    for name in team_names:
+        team_id = seen.get(name)
+        if team_id is None:
+            team_id = seen[name] = canonical_team_id(name)
+        out.append(team_id)
+    return out
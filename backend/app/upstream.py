@@ -0,0 +1,250 @@
+"""
+Shared HTTP client for the upstream APIs (NCAA scoreboard proxy, The Odds API).
+
+One UpstreamClient per host, shared by the sync code (a requests.Session with
+a keep-alive pool) and the async handlers (an httpx.AsyncClient), with:
+
+- a cap on concurrent requests to the host (UPSTREAM_MAX_CONCURRENCY)
+- separate connect and read timeouts (UPSTREAM_CONNECT_TIMEOUT / _READ_TIMEOUT)
+- bounded retries with full-jitter exponential backoff on connection errors,
+  timeouts, 429 and 5xx (UPSTREAM_RETRIES, UPSTREAM_BACKOFF)
+- a circuit breaker: after UPSTREAM_BREAKER_FAILURES failed calls in a row
+  the host is skipped for UPSTREAM_BREAKER_RESET seconds (then one trial call
+  is let through), so callers can fall back to stale cache entries at once
+  instead of each waiting out the timeouts.
+
+Responses with any other status (200, 404, 401, ...) are returned as-is.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import inc, span
+
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))
+RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.25"))
+BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# longest Retry-After we are willing to sleep for inside a request
+MAX_RETRY_AFTER = 5.0
+
+
+class UpstreamError(Exception):
+    """
+    The upstream could not be reached, or kept failing after retries.
+    """
+
+
+class CircuitOpen(UpstreamError):
+    """
+    The host's circuit breaker is open; no request was made.
+    """
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET):
+        self.failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def enter(self) -> bool | None:
+        """
+        None if the call must be skipped, else whether it is the half-open
+        trial; a trial must end in record_success, record_failure or
+        release_trial, or the breaker stays shut.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial:
+                return None
+            self._trial = True  # half-open: let one call through
+            return True
+
+    def allow(self) -> bool:
+        return self.enter() is not None
+
+    def release_trial(self):
+        """
+        End a trial call that recorded no outcome (cancelled, or failed with
+        an unexpected error); the next call becomes the trial.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    return random.uniform(0, BACKOFF * (2 ** attempt))
+
+
+class UpstreamClient:
+    def __init__(self, name: str, max_concurrency: int = MAX_CONCURRENCY, retries: int = RETRIES):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = max(0, retries)
+        self.breaker = CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._aclient: httpx.AsyncClient | None = None
+
+    def _aclient_get(self) -> httpx.AsyncClient:
+        if self._aclient is None or self._aclient.is_closed:
+            # the connection limit doubles as the async concurrency cap
+            self._aclient = httpx.AsyncClient(
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=READ_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            )
+        return self._aclient
+
+    def _enter(self) -> bool:
+        trial = self.breaker.enter()
+        if trial is None:
+            inc("upstream_requests_total", upstream=self.name, outcome="circuit_open")
+            raise CircuitOpen(f"{self.name}: circuit open")
+        return trial
+
+    def _result(self, status: int | None, attempt: int) -> bool:
+        """
+        Count one attempt; True if it should be retried.
+        """
+        retryable = status is None or status in RETRY_STATUSES
+        if not retryable:
+            self.breaker.record_success()
+            outcome = "ok" if status < 400 else ("not_found" if status == 404 else "error")
+            inc("upstream_requests_total", upstream=self.name, outcome=outcome)
+            return False
+        inc("upstream_requests_total", upstream=self.name, outcome="retry" if attempt < self.retries else "exception")
+        return attempt < self.retries
+
+    def get(self, url: str, params: dict | None = None) -> requests.Response:
+        trial = self._enter()
+        try:
+            return self._get(url, params)
+        finally:
+            if trial:
+                self.breaker.release_trial()  # no-op once an outcome was recorded
+
+    def _get(self, url: str, params: dict | None) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            r = None
+            try:
+                with self._slots, span(f"upstream.{self.name}"):
+                    r = self.session.get(url, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                error = None
+            except requests.RequestException as e:
+                error = e
+            if not self._result(r.status_code if r is not None else None, attempt):
+                if r is not None and r.status_code not in RETRY_STATUSES:
+                    return r
+                break
+            time.sleep(_backoff(attempt, r.headers.get("Retry-After") if r is not None else None))
+
+        self.breaker.record_failure()
+        raise UpstreamError(f"{self.name}: {error or f'HTTP {r.status_code}'}") from error
+
+    async def aget(self, url: str, params: dict | None = None) -> httpx.Response:
+        trial = self._enter()
+        try:
+            return await self._aget(url, params)
+        finally:
+            if trial:
+                # e.g. the live poller cancelled mid-request
+                self.breaker.release_trial()
+
+    async def _aget(self, url: str, params: dict | None) -> httpx.Response:
+        client = self._aclient_get()
+        for attempt in range(self.retries + 1):
+            r = None
+            try:
+                with span(f"upstream.{self.name}"):
+                    r = await client.get(url, params=params)
+                error = None
+            except httpx.HTTPError as e:
+                error = e
+            if not self._result(r.status_code if r is not None else None, attempt):
+                if r is not None and r.status_code not in RETRY_STATUSES:
+                    return r
+                break
+            await asyncio.sleep(_backoff(attempt, r.headers.get("Retry-After") if r is not None else None))
+
+        self.breaker.record_failure()
+        raise UpstreamError(f"{self.name}: {error or f'HTTP {r.status_code}'}") from error
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+
+_clients: dict[str, UpstreamClient] = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(base_url: str, name: str) -> UpstreamClient:
+    """
+    The shared client for `base_url`'s host (created on first use).
+    """
+    host = urlsplit(base_url).netloc
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = _clients[host] = UpstreamClient(name)
+        return client
+
+
+async def aclose_all():
+    for client in list(_clients.values()):
+        await client.aclose()
+
+
+def breaker_states() -> dict[str, str]:
+    return {c.name: c.breaker.state for c in _clients.values()}
@@ -0,0 +1,228 @@
+"""
+End-to-end benchmarks against local stand-ins for the NCAA and odds APIs
+(bench/fake_upstream.py), fully offline:
+
+- rebuild_elo_range over a full season, through the fake upstream and then
+  again from the cache table
+- update_elo_from_games, per game
+- GET /api/picks latency and throughput at several concurrency levels, warm
+  (stored slate) and cold (caches and stored picks dropped before each round)
+
+Runs on a throwaway SQLite file by default; pass --database-url to use a
+Postgres database instead (it is written to, so use a scratch one). Results
+are JSON, for diffing with bench.compare:
+
+    cd backend && python -m bench.bench_api --latency-ms 40 --out results.json
+    cd backend && python -m bench.bench_api --database-url postgresql://localhost/ncaa_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bench.fake_upstream import FakeUpstream
+from bench.fixtures import generate, load_manifest
+
+
+def _percentiles(samples: list[float]) -> dict:
+    s = sorted(samples)
+
+    def pct(p):
+        return round(s[min(len(s) - 1, int(p / 100 * len(s)))] * 1000, 3)
+
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": round(s[-1] * 1000, 3),
+            "mean_ms": round(statistics.fmean(s) * 1000, 3)}
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_rebuild(start: date, end: date, workers: int) -> dict:
+    from app.elo_update import rebuild_elo_range
+    from app.local_cache import LOCAL_CACHE
+
+    out = {}
+    for label in ("network", "cached"):
+        # "cached": rows written by the first pass, read back from the cache table
+        LOCAL_CACHE.invalidate()
+        t0 = time.perf_counter()
+        r = rebuild_elo_range(start, end, sleep_seconds=0, workers=workers)
+        out[label] = {
+            "seconds": round(time.perf_counter() - t0, 4),
+            "days": r["days_processed"],
+            "games": r["games_updated"],
+            "timings": r["timings"],
+        }
+    return out
+
+
+def _reset_elo_state():
+    # the rebuild bench recorded every game as applied; start from scratch so
+    # updates time the apply path, not the already-applied skip
+    from app.db import SessionLocal
+    from app.repo import clear_games, clear_processed_days, clear_rating_history, reset_all_elos
+
+    db = SessionLocal()
+    try:
+        clear_games(db)
+        clear_processed_days(db)
+        clear_rating_history(db)
+        reset_all_elos(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def bench_update(start: date, days: int) -> dict:
+    from app.elo_update import update_elo_from_games
+    from app.ncaa import extract_games, get_scoreboard
+
+    slates = [(start + timedelta(days=i), extract_games(get_scoreboard(start + timedelta(days=i)))) for i in range(days)]
+    _reset_elo_state()
+
+    games = 0
+    t0 = time.perf_counter()
+    for d, g in slates:
+        games += update_elo_from_games(g, day=d)["games_updated"]
+    seconds = time.perf_counter() - t0
+    return {"days": days, "games": games, "seconds": round(seconds, 4),
+            "per_game_us": round(seconds / max(games, 1) * 1e6, 2), "per_day_ms": round(seconds / days * 1000, 3)}
+
+
+def _reset_picks_state(slate_day: date):
+    from app.db import SessionLocal
+    from app.local_cache import LOCAL_CACHE
+    from app.models import Cache
+    from app.repo import clear_daily_picks
+
+    LOCAL_CACHE.invalidate()
+    db = SessionLocal()
+    try:
+        clear_daily_picks(db)
+        db.query(Cache).filter(Cache.key.in_([f"scoreboard:{slate_day.isoformat()}", "odds:ncaab:h2h:us"])).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _picks_round(client, url: str, concurrency: int, requests_per_worker: int) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(requests_per_worker):
+            t0 = time.perf_counter()
+            r = await client.get(url)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def _bench_picks(slate_day: date, levels: list[int], requests: int, cold_rounds: int) -> dict:
+    import httpx
+
+    from app.aio import close_http_client
+    from app.db import dispose_async_engine
+    from app.main import app
+
+    url = f"/api/picks?day={slate_day.isoformat()}&limit=10&min_confidence=PASS"
+    out = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        r = await client.get(url)
+        out["slate_games"] = len(r.json())
+
+        for c in levels:
+            per_worker = max(1, requests // c)
+            t0 = time.perf_counter()
+            lat, errors = await _picks_round(client, url, c, per_worker)
+            wall = time.perf_counter() - t0
+            warm = {"requests": len(lat), "errors": errors, "rps": round(len(lat) / wall, 1), **_percentiles(lat)}
+
+            cold_lat, cold_err, cold_wall = [], 0, 0.0
+            for _ in range(cold_rounds):
+                _reset_picks_state(slate_day)
+                t0 = time.perf_counter()
+                lat, errors = await _picks_round(client, url, c, 1)
+                cold_wall += time.perf_counter() - t0
+                cold_lat += lat
+                cold_err += errors
+            cold = {"requests": len(cold_lat), "errors": cold_err, "rps": round(len(cold_lat) / cold_wall, 1),
+                    **_percentiles(cold_lat)}
+            out[f"c{c}"] = {"warm": warm, "cold": cold}
+
+    await close_http_client()
+    await dispose_async_engine()
+    return out
+
+
+def run(args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="ncaa-bench-")
+    fixtures = args.fixtures or os.path.join(tmp, "fixtures")
+    if not args.fixtures:
+        generate(fixtures)
+    m = load_manifest(fixtures)
+
+    with FakeUpstream(fixtures, args.latency_ms, args.jitter_ms) as up:
+        # app modules read these at import time
+        os.environ["NCAA_API_BASE"] = os.environ["ODDS_API_BASE"] = up.url
+        os.environ.setdefault("ODDS_API_KEY", "bench")
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+
+        from app.db import init_db, engine
+
+        init_db()
+        results = {
+            "meta": {
+                "git_rev": _git_rev(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "database": engine.dialect.name,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "workers": args.workers,
+                "fixtures": args.fixtures or "synthetic",
+                "started_at": int(time.time()),
+            },
+            "rebuild": bench_rebuild(m["season_start"], m["season_end"], args.workers),
+            "update_elo": bench_update(m["season_start"], args.update_days),
+            "picks": asyncio.run(_bench_picks(m["slate_day"], args.concurrency, args.requests, args.cold_rounds)),
+        }
+        results["meta"]["upstream_requests"] = dict(up.requests)
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=None, help="fixture dir (default: generate a synthetic season)")
+    ap.add_argument("--database-url", default=None, help="default: a temporary SQLite file")
+    ap.add_argument("--latency-ms", type=float, default=25.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--update-days", type=int, default=30)
+    ap.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32])
+    ap.add_argument("--requests", type=int, default=400, help="warm requests per concurrency level")
+    ap.add_argument("--cold-rounds", type=int, default=5)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text, file=sys.stdout)
@@ -0,0 +1,121 @@
+"""
+Scoreboard parser benchmark: json.loads + extract_games (dicts) vs
+iter_game_records from raw bytes (orjson) and from a file (ijson streaming),
+over a synthetic full-season corpus shaped like the henrygd payload.
+
+Reports throughput and tracemalloc peak memory, both for parsing one day at a
+time and for holding a whole season of parsed games.
+
+    cd backend && python -m bench.bench_parser [--days 150 --games 36]
+"""
+import argparse
+import io
+import json
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from app import ncaa
+from app.ncaa import extract_games, iter_game_records
+
+
+def _team(rnd: random.Random, names: list[str]) -> dict:
+    name = rnd.choice(names)
+    return {
+        "score": str(rnd.randint(45, 99)),
+        "names": {"char6": name[:6].upper(), "short": name, "seo": name.lower().replace(" ", "-"), "full": name + " University"},
+        "winner": False,
+        "seed": "",
+        "description": "(10-5)",
+        "rank": "",
+        "conferences": [{"conferenceName": "Big Conference", "conferenceSeo": "big-conf"}],
+    }
+
+
+def build_corpus(days: int, games_per_day: int, seed: int = 7) -> list[bytes]:
+    rnd = random.Random(seed)
+    names = [f"School {i}" for i in range(360)]
+    start = date(2024, 11, 4)
+    corpus = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        games = [
+            {"game": {
+                "gameID": str(1000000 + i * 100 + j),
+                "away": _team(rnd, names),
+                "home": _team(rnd, names),
+                "finalMessage": "FINAL",
+                "bracketRound": "",
+                "title": "Away Home",
+                "contestName": "",
+                "url": f"/game/{1000000 + i * 100 + j}",
+                "network": "ESPN+",
+                "liveVideoEnabled": False,
+                "startTime": "07:00PM ET",
+                "startTimeEpoch": "1736000000",
+                "bracketId": "",
+                "gameState": "final",
+                "startDate": d.strftime("%m-%d-%Y"),
+                "currentPeriod": "FINAL",
+                "videoState": "",
+                "bracketRegion": "",
+                "contestClock": "0:00",
+                "neutralSite": rnd.random() < 0.1,
+            }}
+            for j in range(games_per_day)
+        ]
+        corpus.append(json.dumps({"inputMD5Sum": "x" * 32, "updated_at": "now", "games": games}).encode())
+    return corpus
+
+
+def _measure(fn, corpus: list[bytes], keep: bool) -> dict:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = 0
+    kept = []
+    for raw in corpus:
+        out = fn(raw)
+        n += len(out)
+        if keep:
+            kept.append(out)
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"games": n, "seconds": round(seconds, 4), "games_per_sec": int(n / seconds), "peak_mib": round(peak / 2**20, 2)}
+
+
+def run(days: int = 150, games_per_day: int = 36) -> dict:
+    corpus = build_corpus(days, games_per_day)
+
+    parsers = {
+        "json_extract_games": lambda raw: extract_games(json.loads(raw)),
+        "records_from_bytes": lambda raw: list(iter_game_records(raw)),
+        "records_from_file": lambda raw: list(iter_game_records(io.BytesIO(raw))),
+    }
+
+    # sanity check: identical output
+    ref = extract_games(json.loads(corpus[0]))
+    for name, fn in parsers.items():
+        out = fn(corpus[0])
+        assert [g if isinstance(g, dict) else g.as_dict() for g in out] == ref, name
+
+    results = {
+        "corpus": {"days": days, "games": days * games_per_day, "bytes": sum(map(len, corpus))},
+        "orjson": ncaa.orjson is not None,
+        "ijson": ncaa.ijson is not None,
+        "per_day": {},
+        "whole_season": {},
+    }
+    for name, fn in parsers.items():
+        results["per_day"][name] = _measure(fn, corpus, keep=False)
+        results["whole_season"][name] = _measure(fn, corpus, keep=True)
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=150)
+    ap.add_argument("--games", type=int, default=36)
+    args = ap.parse_args()
+    print(json.dumps(run(args.days, args.games), indent=2))
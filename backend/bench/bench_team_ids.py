@@ -0,0 +1,52 @@
+"""
+Microbenchmark for team_ids.canonical_team_id over the full D1 team list.
+
+    cd backend && python -m bench.bench_team_ids
+"""
+import json
+import os
+import time
+
+from app.team_ids import canonical_team_id, canonical_team_ids
+
+HERE = os.path.dirname(__file__)
+
+
+def load_names() -> list[str]:
+    with open(os.path.join(HERE, "d1_teams.txt")) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _per_call_ns(fn, names: list[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(names)
+    return (time.perf_counter() - t0) / (repeat * len(names)) * 1e9
+
+
+def run(repeat: int = 200) -> dict:
+    names = load_names()
+
+    def cold(ns):
+        for n in ns:
+            canonical_team_id.__wrapped__(n)
+
+    def warm(ns):
+        for n in ns:
+            canonical_team_id(n)
+
+    # a slate: every team appears once per game side, many names repeat
+    slate = names * 4
+
+    canonical_team_ids(names)  # prime the memo
+    return {
+        "teams": len(names),
+        "uncached_ns_per_name": round(_per_call_ns(cold, names, repeat), 1),
+        "memoized_ns_per_name": round(_per_call_ns(warm, names, repeat), 1),
+        "batch_ns_per_name": round(_per_call_ns(canonical_team_ids, slate, repeat), 1),
+        "cache": canonical_team_id.cache_info()._asdict(),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
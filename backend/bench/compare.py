@@ -0,0 +1,78 @@
+"""
+Compare two benchmark result files (any of the bench.* JSON outputs) and
+flag regressions.
+
+    cd backend && python -m bench.compare baseline.json results.json [--threshold 0.1]
+
+Numeric leaves are matched by path. Metrics named like *_ms, *seconds, *_us
+and *_mib are lower-is-better; rps and *_per_sec are higher-is-better; others
+are shown but never flagged. Exits 1 when anything regressed past the
+threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _flatten(obj, prefix=""):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else str(k))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+
+def direction(path: str) -> int:
+    """
+    +1 if higher is better, -1 if lower is better, 0 if neither.
+    """
+    leaf = path.rsplit(".", 1)[-1]
+    if path.startswith("meta."):
+        return 0
+    if leaf == "rps" or leaf.endswith("_per_sec"):
+        return 1
+    if leaf.endswith(("_ms", "_us", "_ns", "_mib")) or "seconds" in leaf or path.split(".")[-2:-1] == ["timings"]:
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float = 0.10) -> list[dict]:
+    base = dict(_flatten(old))
+    rows = []
+    for path, value in _flatten(new):
+        if path not in base:
+            continue
+        before = base[path]
+        change = (value - before) / before if before else 0.0
+        sign = direction(path)
+        rows.append({
+            "metric": path,
+            "old": before,
+            "new": value,
+            "change": round(change, 4),
+            "regressed": sign != 0 and -sign * change > threshold,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    ap.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = ap.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare(old, new, args.threshold)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            flag = "REGRESSED" if r["regressed"] else ""
+            print(f"{r['metric']:<55} {r['old']:>12.4g} {r['new']:>12.4g} {r['change']:>+8.1%} {flag}")
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the NCAA scoreboard proxy and The Odds API, serving a
+fixture directory (see bench/fixtures.py) with configurable latency.
+
+Point the app at it with NCAA_API_BASE / ODDS_API_BASE (set before importing
+app modules):
+
+    with FakeUpstream("/tmp/fixtures", latency_ms=40) as up:
+        os.environ["NCAA_API_BASE"] = os.environ["ODDS_API_BASE"] = up.url
+
+Or standalone, for running the real server against it:
+
+    cd backend && python -m bench.fake_upstream /tmp/fixtures --port 8765 --latency-ms 40
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SCOREBOARD = re.compile(r"^/scoreboard/basketball-men/d1/(\d{4})/(\d{2})/(\d{2})/?$")
+_ODDS = re.compile(r"^/v4/sports/[\w-]+/odds/?$")
+
+
+class FakeUpstream:
+    def __init__(self, fixtures: str, latency_ms: float = 0.0, jitter_ms: float = 0.0, port: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.requests = {"scoreboard": 0, "odds": 0, "not_found": 0}
+        self._lock = threading.Lock()
+        self._files = self._load(fixtures)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _load(fixtures: str) -> dict[str, bytes]:
+        files = {}
+        sb_dir = os.path.join(fixtures, "scoreboard")
+        for fn in os.listdir(sb_dir):
+            if fn.endswith(".json"):
+                with open(os.path.join(sb_dir, fn), "rb") as f:
+                    files[fn[:-5]] = f.read()
+        odds_path = os.path.join(fixtures, "odds.json")
+        if os.path.exists(odds_path):
+            with open(odds_path, "rb") as f:
+                files["odds"] = f.read()
+        return files
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        up = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                body = None
+                m = _SCOREBOARD.match(path)
+                if m:
+                    body = up._files.get("-".join(m.groups()))
+                    kind = "scoreboard"
+                elif _ODDS.match(path):
+                    body = up._files.get("odds")
+                    kind = "odds"
+
+                delay = up.latency + (random.uniform(0, up.jitter) if up.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+
+                with up._lock:
+                    up.requests["not_found" if body is None else kind] += 1
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeUpstream":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("fixtures")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    up = FakeUpstream(args.fixtures, args.latency_ms, args.jitter_ms, args.port)
+    print(f"serving {args.fixtures} on {up.url}")
+    try:
+        up._server.serve_forever()
+    except KeyboardInterrupt:
+        up.stop()
@@ -0,0 +1,198 @@
+"""
+Scoreboard and odds fixtures for the offline benchmarks.
+
+A fixture directory holds what the two upstream APIs would return:
+
+    manifest.json               {"season_start", "season_end", "slate_day"}
+    scoreboard/YYYY-MM-DD.json  henrygd scoreboard payload for that day
+    odds.json                   The Odds API /v4/sports/{sport}/odds response
+
+`slate_day` is a day whose games are still upcoming, used for /api/picks.
+Fixtures are either synthetic (shaped like the real payloads, over the D1
+team list) or recorded from the live APIs:
+
+    cd backend && python -m bench.fixtures generate --out /tmp/fixtures
+    cd backend && python -m bench.fixtures record --start 2024-11-04 --end 2025-04-07 --out fixtures/2024-25
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+from bench.bench_team_ids import load_names
+
+SEASON_START = date(2024, 11, 4)
+SEASON_END = date(2025, 4, 7)
+
+
+def _team(name: str, score: int | None) -> dict:
+    return {
+        "score": "" if score is None else str(score),
+        "names": {"char6": name[:6].upper(), "short": name, "seo": name.lower().replace(" ", "-"), "full": name},
+        "winner": False,
+        "seed": "",
+        "description": "",
+        "rank": "",
+        "conferences": [{"conferenceName": "", "conferenceSeo": ""}],
+    }
+
+
+def _games_on(d: date, rnd: random.Random, names: list[str]) -> int:
+    # Saturdays are the heavy days; early November and March are lighter
+    n = rnd.randint(12, 45)
+    if d.weekday() == 5:
+        n = rnd.randint(110, 150)
+    return min(n, len(names) // 2)
+
+
+def scoreboard(d: date, rnd: random.Random, names: list[str], strength: dict[str, float], upcoming: bool = False) -> dict:
+    games = []
+    teams = rnd.sample(names, 2 * _games_on(d, rnd, names))
+    for i in range(0, len(teams), 2):
+        home, away = teams[i], teams[i + 1]
+        home_score = away_score = None
+        if not upcoming:
+            margin = strength[home] - strength[away] + 3.0 + rnd.gauss(0, 11)
+            base = rnd.randint(58, 78)
+            home_score = base + max(int(round(margin)), 1) if margin > 0 else base
+            away_score = base if margin > 0 else base + max(int(round(-margin)), 1)
+        game_id = str(6_000_000 + d.toordinal() * 200 + i // 2)
+        games.append({"game": {
+            "gameID": game_id,
+            "home": _team(home, home_score),
+            "away": _team(away, away_score),
+            "gameState": "pre" if upcoming else "final",
+            "startDate": d.strftime("%m-%d-%Y"),
+            "startTime": "07:00PM ET",
+            "currentPeriod": "" if upcoming else "FINAL",
+            "contestClock": "0:00",
+            "neutralSite": rnd.random() < 0.08,
+            "url": f"/game/{game_id}",
+        }})
+    return {"inputMD5Sum": "", "updated_at": "", "games": games}
+
+
+def odds_events(slate: dict, day: date, rnd: random.Random, strength: dict[str, float]) -> list[dict]:
+    books = ["DraftKings", "FanDuel", "BetMGM", "Caesars", "BetRivers", "Bovada"]
+    # 7pm Eastern on the slate day
+    commence = f"{day.isoformat()}T23:00:00Z"
+    events = []
+    for item in slate["games"]:
+        g = item["game"]
+        home, away = g["home"]["names"]["short"], g["away"]["names"]["short"]
+        p_home = 1 / (1 + 10 ** (-(strength[home] - strength[away] + 3.0) / 14))
+        bookmakers = []
+        for book in rnd.sample(books, rnd.randint(2, len(books))):
+            p = min(max(p_home + rnd.gauss(0, 0.02), 0.03), 0.97)
+            bookmakers.append({
+                "key": book.lower(),
+                "title": book,
+                "markets": [{"key": "h2h", "outcomes": [
+                    {"name": home, "price": _american(p)},
+                    {"name": away, "price": _american(1 - p)},
+                ]}],
+            })
+        events.append({
+            "id": g["gameID"],
+            "sport_key": "basketball_ncaab",
+            "commence_time": commence,
+            "home_team": home,
+            "away_team": away,
+            "bookmakers": bookmakers,
+        })
+    return events
+
+
+def _american(p: float) -> int:
+    if p >= 0.5:
+        return -int(round(100 * p / (1 - p)))
+    return int(round(100 * (1 - p) / p))
+
+
+def _write_json(path: str, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(obj, f, separators=(",", ":"))
+
+
+def generate(out: str, start: date = SEASON_START, end: date = SEASON_END, seed: int = 7) -> dict:
+    rnd = random.Random(seed)
+    names = load_names()
+    strength = {n: rnd.gauss(0, 8) for n in names}
+
+    d = start
+    while d <= end:
+        _write_json(os.path.join(out, "scoreboard", f"{d.isoformat()}.json"), scoreboard(d, rnd, names, strength))
+        d += timedelta(days=1)
+
+    slate_day = end + timedelta(days=1)
+    slate = scoreboard(slate_day, rnd, names, strength, upcoming=True)
+    _write_json(os.path.join(out, "scoreboard", f"{slate_day.isoformat()}.json"), slate)
+    _write_json(os.path.join(out, "odds.json"), odds_events(slate, slate_day, rnd, strength))
+
+    manifest = {"season_start": start.isoformat(), "season_end": end.isoformat(), "slate_day": slate_day.isoformat()}
+    _write_json(os.path.join(out, "manifest.json"), manifest)
+    return manifest
+
+
+def record(out: str, start: date, end: date, slate_day: date | None = None) -> dict:
+    """
+    Save live responses for [start, end] (and `slate_day`) plus the current
+    odds. Needs network access; the odds file is skipped without ODDS_API_KEY.
+    """
+    import requests
+
+    from app.ncaa import _proxy_url
+    from app.odds import fetch_ncaab_moneylines, ODDS_API_KEY
+
+    days = []
+    d = start
+    while d <= end:
+        days.append(d)
+        d += timedelta(days=1)
+    slate_day = slate_day or date.today()
+    days.append(slate_day)
+
+    for d in days:
+        r = requests.get(_proxy_url(d), timeout=20)
+        if r.status_code == 404:
+            continue
+        r.raise_for_status()
+        _write_json(os.path.join(out, "scoreboard", f"{d.isoformat()}.json"), r.json())
+
+    if ODDS_API_KEY:
+        _write_json(os.path.join(out, "odds.json"), fetch_ncaab_moneylines())
+
+    manifest = {"season_start": start.isoformat(), "season_end": end.isoformat(), "slate_day": slate_day.isoformat()}
+    _write_json(os.path.join(out, "manifest.json"), manifest)
+    return manifest
+
+
+def load_manifest(path: str) -> dict:
+    with open(os.path.join(path, "manifest.json")) as f:
+        m = json.load(f)
+    return {k: date.fromisoformat(v) for k, v in m.items()}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("generate")
+    g.add_argument("--out", required=True)
+    g.add_argument("--start", default=SEASON_START.isoformat())
+    g.add_argument("--end", default=SEASON_END.isoformat())
+    g.add_argument("--seed", type=int, default=7)
+    r = sub.add_parser("record")
+    r.add_argument("--out", required=True)
+    r.add_argument("--start", required=True)
+    r.add_argument("--end", required=True)
+    r.add_argument("--slate-day", default=None)
+    args = ap.parse_args()
+
+    if args.cmd == "generate":
+        m = generate(args.out, date.fromisoformat(args.start), date.fromisoformat(args.end), args.seed)
+    else:
+        m = record(args.out, date.fromisoformat(args.start), date.fromisoformat(args.end),
+                   date.fromisoformat(args.slate_day) if args.slate_day else None)
+    print(json.dumps(m, indent=2))
@@ -0,0 +1,56 @@
+"""
+Shared setup: a throwaway SQLite database and archive directory, and a
+FakeUpstream serving a week of synthetic scoreboards (bench/fixtures.py).
+The environment is set here, before any app module reads it.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import tempfile
+from datetime import timedelta
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="ncaa-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.sqlite3')}"
+os.environ["SCOREBOARD_ARCHIVE_DIR"] = os.path.join(_TMP, "archive")
+
+from bench.fake_upstream import FakeUpstream  # noqa: E402
+from bench.fixtures import SEASON_START, generate, load_manifest  # noqa: E402
+
+FIXTURES = os.path.join(_TMP, "fixtures")
+generate(FIXTURES, SEASON_START, SEASON_START + timedelta(days=6))
+
+_UPSTREAM = FakeUpstream(FIXTURES).start()
+os.environ["NCAA_API_BASE"] = _UPSTREAM.url
+
+
+@pytest.fixture(scope="session")
+def manifest():
+    return load_manifest(FIXTURES)
+
+
+@pytest.fixture(scope="session")
+def db_ready():
+    from app.db import init_db
+    init_db()
+
+
+@pytest.fixture
+def clean_db(db_ready):
+    from app.db import SessionLocal
+    from app.repo import clear_games, clear_processed_days, clear_rating_history, reset_all_elos
+
+    db = SessionLocal()
+    try:
+        clear_games(db)
+        clear_processed_days(db)
+        clear_rating_history(db)
+        reset_all_elos(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    _UPSTREAM.stop()
@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+
+from app.elo import HOME_ADV, confidence_label, pick_winner, pick_winner_batch, win_prob, win_prob_batch, win_prob_matrix
+
+
+def _ratings(n: int, seed: int = 1) -> tuple[list[float], list[float]]:
+    rnd = random.Random(seed)
+    home = [rnd.gauss(1500, 120) for _ in range(n)]
+    away = [rnd.gauss(1500, 120) for _ in range(n)]
+    # exact ties and the pick boundary (p_home == 0.5 after the home bump)
+    home += [1500.0, 1450.0]
+    away += [1500.0, 1500.0]
+    return home, away
+
+
+def test_win_prob_batch_is_bit_identical():
+    home, away = _ratings(500)
+    batch = win_prob_batch(home, away)
+    assert batch.tolist() == [win_prob(h, a) for h, a in zip(home, away)]
+
+
+def test_pick_winner_batch_is_bit_identical():
+    home, away = _ratings(500)
+    neutral = [i % 3 == 0 for i in range(len(home))]
+    sides, probs, labels = pick_winner_batch(home, away, neutral)
+    for i, (h, a) in enumerate(zip(home, away)):
+        side, p = pick_winner(h, a, home_adv=0.0 if neutral[i] else HOME_ADV)
+        assert (sides[i], probs[i], labels[i]) == (side, p, confidence_label(p))
+
+
+def test_win_prob_matrix_matches_scalar():
+    elos, _ = _ratings(40)
+    m = win_prob_matrix(elos, adv=HOME_ADV)
+    expected = np.array([[win_prob(a + HOME_ADV, b) for b in elos] for a in elos])
+    assert np.array_equal(m, expected)
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from app.db import SessionLocal
+from app.elo_update import _apply_games_db, catch_up_elo, game_key, game_rows, unseen_finals, update_elo_from_games
+from app.ncaa import extract_games, get_scoreboard
+from app.repo import claim_games, load_team_ratings
+
+
+def _ratings() -> dict[str, float]:
+    db = SessionLocal()
+    try:
+        return load_team_ratings(db)[0]
+    finally:
+        db.close()
+
+
+def _day_games(manifest, offset: int = 0):
+    d = manifest["season_start"] + timedelta(days=offset)
+    return d, extract_games(get_scoreboard(d))
+
+
+def test_claim_games_claims_each_id_once(clean_db, manifest):
+    d, games = _day_games(manifest)
+    rows = game_rows(unseen_finals(games, d, set()), d)
+    assert rows
+    db = SessionLocal()
+    try:
+        assert claim_games(db, rows) == {r["id"] for r in rows}
+        assert claim_games(db, rows) == set()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_apply_games_db_skips_applied_and_repeated_games(clean_db, manifest):
+    d, games = _day_games(manifest)
+    n_finals = len({game_key(g, d) for _, g in unseen_finals(games, d, set())})
+    db = SessionLocal()
+    try:
+        # the same game twice in one batch counts once
+        assert _apply_games_db(db, games + games, d)[0] == n_finals
+        assert _apply_games_db(db, games, d)[0] == 0
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_update_elo_from_games_is_idempotent(clean_db, manifest):
+    d, games = _day_games(manifest)
+    first = update_elo_from_games(games, day=d)
+    assert first["games_updated"] > 0
+    after_first = _ratings()
+
+    second = update_elo_from_games(games, day=d)
+    assert second == {"games_updated": 0, "games_already_applied": first["games_updated"]}
+    assert _ratings() == after_first
+
+
+def test_catch_up_elo_rerun_applies_nothing(clean_db, manifest):
+    start, end = manifest["season_start"], manifest["season_end"]
+    first = catch_up_elo(until=end, start=start, sleep_seconds=0)
+    assert first["games_updated"] > 0 and not first["days_missing"]
+    after_first = _ratings()
+
+    second = catch_up_elo(until=end, start=start, sleep_seconds=0)
+    assert second["games_updated"] == 0
+    assert _ratings() == after_first
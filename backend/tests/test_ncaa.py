@@ -0,0 +1,36 @@
+import io
+import json
+import os
+
+import pytest
+
+from app.ncaa import extract_games, get_scoreboard, iter_game_records
+from conftest import FIXTURES
+
+
+def _fixture_days() -> list[bytes]:
+    sb_dir = os.path.join(FIXTURES, "scoreboard")
+    out = []
+    for fn in sorted(os.listdir(sb_dir)):
+        with open(os.path.join(sb_dir, fn), "rb") as f:
+            out.append(f.read())
+    return out
+
+
+@pytest.mark.parametrize("source", ["dict", "bytes", "str", "file"])
+def test_iter_game_records_matches_extract_games(source):
+    for raw in _fixture_days():
+        sb = json.loads(raw)
+        arg = {"dict": sb, "bytes": raw, "str": raw.decode(), "file": io.BytesIO(raw)}[source]
+        assert [r.as_dict() for r in iter_game_records(arg)] == extract_games(sb)
+
+
+def test_iter_game_records_empty():
+    assert list(iter_game_records({})) == []
+    assert list(iter_game_records(b'{"games": []}')) == []
+
+
+def test_get_scoreboard_from_upstream(db_ready, manifest):
+    sb = get_scoreboard(manifest["season_start"])
+    assert extract_games(sb)
+    assert [r.as_dict() for r in iter_game_records(sb)] == extract_games(sb)